@@ -0,0 +1,129 @@
+#-------------------------------------------------------------------------------
+# Name:        Notional Index module
+# Purpose:     Provides an object class for building and querying an on-disk
+#              inverted keyword index over content recovered by the Notional
+#              SQLite module, pointing each hit back to its physical offsets.
+#
+# Author:      Notional-Labs.com
+#
+# Created:     18/10/2026
+# Licence:     Apache V.2
+#-------------------------------------------------------------------------------
+import logging
+import re
+import sqlite3
+
+class NotionalIndex(object):
+    """
+    NotionalIndex stores (term, page offset, cell offset, region type) hits in
+    a SQLite file. Hits are buffered and written in batches while content is
+    decoded, so the recovered content itself is never held in memory. The
+    distinct terms are kept in a separate vocabulary table for regex search.
+    """
+    _termre = re.compile(r'\w{3,}', re.U)
+    _batchsize = 10000
+
+    def __init__(self, indexpath, create=False):
+        """
+        Pass the path of the index file. Set create to start a new (empty)
+        index; otherwise an existing index is opened for querying (and its
+        vocabulary built once if it predates the terms table).
+        """
+        self.indexpath = indexpath
+        self._hitbuffer = list()
+        self.hitcount = 0
+        self.dbconn = sqlite3.connect(indexpath)
+        if create:
+            self.dbconn.execute("DROP TABLE IF EXISTS hits")
+            self.dbconn.execute("DROP TABLE IF EXISTS terms")
+            self.dbconn.execute("CREATE TABLE hits (term TEXT, pageofs INTEGER, cellofs INTEGER, region TEXT, tablename TEXT)")
+            self.dbconn.execute("CREATE TABLE terms (term TEXT PRIMARY KEY)")
+            self.dbconn.commit()
+        elif self.dbconn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'terms'").fetchone()[0] == 0:
+            self.dbconn.execute("CREATE TABLE terms (term TEXT PRIMARY KEY)")
+            self.dbconn.execute("INSERT INTO terms SELECT DISTINCT term FROM hits")
+            self.dbconn.commit()
+
+    def _flush(self):
+        """
+        Write the buffered hits, and any new terms, to the index file.
+        """
+        if self._hitbuffer:
+            self.dbconn.executemany("INSERT INTO hits VALUES (?,?,?,?,?)", self._hitbuffer)
+            self.dbconn.executemany("INSERT OR IGNORE INTO terms VALUES (?)", [(term,) for term in set([hit[0] for hit in self._hitbuffer])])
+            self.dbconn.commit()
+            self._hitbuffer = list()
+
+    def addContent(self, pageofs, cellofs, region, values, tablename=None):
+        """
+        Tokenise decoded content and add one hit per distinct term.
+        Pass the absolute page offset, the absolute offset of the cell or
+        unallocated region, the region type (e.g. "Active Cell", "Free Block"),
+        a list of decoded values and optionally the owning table name.
+        """
+        terms = set()
+        for value in values:
+            if value is None:
+                continue
+            if isinstance(value, bytes):
+                value = value.decode("utf-8", "replace")
+            elif isinstance(value, float):
+                value = "%.12g" % value # same terms as indexes built by earlier releases
+            elif not isinstance(value, str):
+                value = str(value)
+            terms.update(self._termre.findall(value.lower()))
+        for term in terms:
+            self._hitbuffer.append((term, pageofs, cellofs, region, tablename))
+        self.hitcount+=len(terms)
+        if len(self._hitbuffer) >= self._batchsize:
+            self._flush()
+
+    def checkpoint(self):
+        """
+        Flush any buffered hits so the index file is consistent with the
+        content exported so far.
+        Returns the number of hit rows stored, for truncate() on resume.
+        """
+        self._flush()
+        return self.dbconn.execute("SELECT COALESCE(MAX(rowid),0) FROM hits").fetchone()[0]
+
+    def truncate(self, rowcount):
+        """
+        Discard hits stored after a checkpoint() which returned rowcount, and
+        any terms left without a hit.
+        """
+        self.dbconn.execute("DELETE FROM hits WHERE rowid > ?", (rowcount,))
+        self.dbconn.execute("DELETE FROM terms WHERE term NOT IN (SELECT term FROM hits)")
+        self.dbconn.commit()
+
+    def close(self):
+        """
+        Flush any buffered hits, build the term lookup index (once, after the
+        bulk load) and close the index file.
+        """
+        self._flush()
+        self.dbconn.execute("CREATE INDEX IF NOT EXISTS hits_term ON hits (term)")
+        self.dbconn.commit()
+        self.dbconn.close()
+
+    def search(self, keyword):
+        """
+        Look up a single keyword (case-insensitive, whole term).
+        Returns a list of tuples in the form
+        [(term,page offset,cell offset,region,table name),...].
+        """
+        return self.dbconn.execute("SELECT term,pageofs,cellofs,region,tablename FROM hits WHERE term = ? ORDER BY pageofs,cellofs", (keyword.lower(),)).fetchall()
+
+    def searchRegex(self, pattern):
+        """
+        Match a regular expression (case-insensitive) against the vocabulary
+        table rather than the content, then fetch the hits of all matching
+        terms in one lookup.
+        Returns a list of tuples in the same form as search().
+        """
+        termre = re.compile(pattern, re.I | re.U)
+        matches = [(term,) for (term,) in self.dbconn.execute("SELECT term FROM terms") if termre.search(term)]
+        self.dbconn.execute("CREATE TEMP TABLE IF NOT EXISTS matches (term TEXT PRIMARY KEY)")
+        self.dbconn.execute("DELETE FROM matches")
+        self.dbconn.executemany("INSERT INTO matches VALUES (?)", matches)
+        return self.dbconn.execute("SELECT term,pageofs,cellofs,region,tablename FROM hits WHERE term IN (SELECT term FROM matches) ORDER BY pageofs,cellofs,term").fetchall()
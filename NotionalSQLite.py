@@ -9,13 +9,26 @@
 # Created:     30/08/2013
 # Licence:     Apache V.2
 #-------------------------------------------------------------------------------
+import bisect
 import logging
+import mmap
+import multiprocessing
 import struct
 import os
 import re
 import unicodedata
 
-class NotionalSQLite:
+class PageParseError(Exception):
+    """
+    Raised when a page's structure fails a bounds, cycle or work budget check.
+    Carries the absolute page offset and a description of the failure.
+    """
+    def __init__(self, offset, reason):
+        Exception.__init__(self, "Page %s: %s" % (str(offset), reason))
+        self.offset = offset
+        self.reason = reason
+
+class NotionalSQLite(object):
     """
     NotionalSQLite is used to store file structure information and provide
     convenience functions for parsing the contents.
@@ -27,23 +40,85 @@ class NotionalSQLite:
                 "bigroottree","textencode","userver","incvac","expansion",
                 "validfor","sqlver"]
     _btreetblleafheaderfmt = ">bsssbi"
-    all_chars = (unichr(i) for i in xrange(0x110000))
-    control_chars = ''.join(map(unichr, range(0,32) + range(127,160)))
+    control_chars = bytes(list(range(0,32)) + list(range(127,160)))
+    _controlcharre = re.compile(b'[' + re.escape(control_chars) + b']')
+    # Record field decoders keyed by the serial type names from _parseCellHeader.
+    # Each takes (payload body, position, field length); fixed-width numbers
+    # are unpacked in place from the body bytes.
+    _serialdecoders = {"NULL":lambda data,pos,length: None,
+                       "ST_INT8":lambda data,pos,length: struct.unpack_from(">b",data,pos)[0],
+                       "ST_INT16":lambda data,pos,length: struct.unpack_from(">h",data,pos)[0],
+                       "ST_INT24":lambda data,pos,length: int.from_bytes(data[pos:pos+3],"big",signed=True),
+                       "ST_INT32":lambda data,pos,length: struct.unpack_from(">i",data,pos)[0],
+                       "ST_INT48":lambda data,pos,length: int.from_bytes(data[pos:pos+6],"big",signed=True),
+                       "ST_INT64":lambda data,pos,length: struct.unpack_from(">q",data,pos)[0],
+                       "ST_FLOAT":lambda data,pos,length: struct.unpack_from(">d",data,pos)[0],
+                       "ST_C0":lambda data,pos,length: 0,
+                       "ST_C1":lambda data,pos,length: 1,
+                       "ST_BLOB":lambda data,pos,length: data[pos:pos+length],
+                       "ST_TEXT":lambda data,pos,length: data[pos:pos+length]}
 
-    statuscode = 1
-    headerdict = dict()
-    headertransdict = dict()
-    isDirty = bool()
-    dbfile = None
-    isWAL = False
-    debug = False
+    # (length, decoder taking (payload body, position)) indexed by serial types
+    # 0-11, for the compiled row decoders; 10 and 11 are reserved.
+    _fixedserialtypes = ((0,lambda data,pos: None),
+                         (1,lambda data,pos: struct.unpack_from(">b",data,pos)[0]),
+                         (2,lambda data,pos: struct.unpack_from(">h",data,pos)[0]),
+                         (3,lambda data,pos: int.from_bytes(data[pos:pos+3],"big",signed=True)),
+                         (4,lambda data,pos: struct.unpack_from(">i",data,pos)[0]),
+                         (6,lambda data,pos: int.from_bytes(data[pos:pos+6],"big",signed=True)),
+                         (8,lambda data,pos: struct.unpack_from(">q",data,pos)[0]),
+                         (8,lambda data,pos: struct.unpack_from(">d",data,pos)[0]),
+                         (0,lambda data,pos: 0),
+                         (0,lambda data,pos: 1),
+                         (0,None),
+                         (0,None))
 
-    def __init__(self, filepath, debug):
+    def __init__(self, filepath, debug, baseoffset=0, dbend=None, hardened=False, headerless=False, textencode=1):
+        """
+        Pass the path of the database file. To treat a database embedded in a
+        larger file (e.g. one carved from a disk image) as a virtual database,
+        pass the absolute offset of its header as baseoffset and optionally the
+        absolute offset at which it ends as dbend. Set hardened to record pages
+        which fail to parse in pageerrors and carry on, rather than raising.
+        Set headerless to decode pages which have no database header of their
+        own (e.g. orphaned pages carved from an image): no header is read, TEXT
+        is decoded using textencode (1 UTF-8, 2 UTF-16LE, 3 UTF-16BE), pages
+        have no reserved bytes, overflow chains are not followed and no page
+        is treated as page 1.
+        statuscode is 0 once the object is ready, 1 if the file could not be
+        opened or is too small for a header, and 2 if the header has a valid
+        signature but an invalid page size (no page can be located).
+        """
 
+        self.statuscode = 1
+        self.isDirty = bool()
+        self.dbfile = None
+        self.isWAL = False
         self.debug = debug
+        self.baseoffset = baseoffset
+        self.dbend = dbend
+        self.hardened = hardened
+        self.headerless = headerless
+        self.pageerrors = list()
+        self._freeblockfaults = set() # pages whose broken freeblock chain is already recorded
+
+        # Instance-local state - derived views are computed on first access and
+        # cached (see the pagetypedict, headertransdict, schema and tables properties).
+        self.headerdict = dict()
+        self._headertransdict = None
+        self._pagetypedict = None
+        self._schema = None
+        self._tables = None
+
+        # Bounds of the page currently being parsed - set by
+        # _parseTableLeafPageHeader and checked by the cell decoders. The
+        # page end is cut short at dbend for a truncated last page.
+        self._pagestart = None
+        self._pageend = None
+        self._pagesize = None
+        self._pagebudget = None
 
         for key in self._dictkeys:
-            self.headertransdict[key] = "ERROR - call translateHeader() first."
             self.headerdict[key] = "ERROR - Could not read value."
         try:
             self.dbfile = open(filepath,"rb")
@@ -51,146 +126,584 @@ class NotionalSQLite:
             logging.error("ERROR: Could not open database file")
             return
 
-        self._parseDBHeader();
+        if headerless:
+            self.headerdict["textencode"] = textencode
+            self.headerdict["resspace"] = 0
+            if self.dbend is None:
+                self.dbend = os.path.getsize(self.dbfile.name)
+            self.statuscode = 0
+            return
+
+        if not self._parseDBHeader():
+            logging.error("ERROR: File is too small to contain a database header")
+            return
+        if self.checkSignature() and not self._checkPageSize():
+            logging.error("ERROR: Invalid page size in database header: %s" % str(self.headerdict["pagesize"]))
+            self.statuscode = 2
+            return
+
+        # Physical extent of the database. A standalone file is scanned to its
+        # end; an embedded one is bounded by its in-header page count if valid.
+        if self.dbend is None:
+            filesize = os.path.getsize(self.dbfile.name)
+            dbsize = self.headerdict["dbsize"]
+            if (self.baseoffset > 0) and (dbsize > 0):
+                self.dbend = min(filesize, self.baseoffset + dbsize*self.getPageSize())
+            else:
+                self.dbend = filesize
 
         if self.debug:
             pass
 
         self.statuscode = 0
 
+    @property
+    def headertransdict(self):
+        """
+        Human-readable header values. Translated on first access and cached.
+        """
+        if self._headertransdict is None:
+            self.translateHeader()
+        return self._headertransdict
+
+    @property
+    def pagetypedict(self):
+        """
+        Page type survey of the whole file (see getPageTypeDict). Scanned on
+        first access and cached.
+        """
+        if self._pagetypedict is None:
+            self._pagetypedict = self.getPageTypeDict(self.getPageSize())
+        return self._pagetypedict
+
+    @property
+    def schema(self):
+        """
+        Rows of the sqlite_master table in the form
+        [(type,name,tbl_name,rootpage,sql),...]. Decoded on first access from
+        the sqlite_master B-tree rooted at page 1 - no sqlite3 connection is
+        made - and cached. Raises PageParseError if the tree cannot be parsed.
+        """
+        if self._schema is None:
+            schema = list()
+            for page in self.getTableLeafPages(1):
+                for cell, element in self.getActiveCellContent(page,self.getPageSize(),self._parseRecord):
+                    element = element[1]
+                    element.extend([None]*(5-len(element)))
+                    schema.append(tuple(element[:5]))
+            self._schema = schema
+        return self._schema
+
     def _strip_nonprintable(self,s):
-        control_char_re = re.compile('[%s]' % re.escape(self.control_chars))
-        return control_char_re.sub('', s)
+        return self._controlcharre.sub(b'', s)
 
     def _parseTableLeafPageHeader(self,offset,pagesize):
         """
         Parse a binary-tree Table Leaf header given its starting (physical) offset.
         Pass physical offset to start of page (should be 0x0D) and page size from
         DB header. cell-pointers, freeblock lists, and the offset to unused area
-        are relative offsets.
+        are relative offsets. Page 1 (at the base offset) is handled by skipping the 100
+        byte database header that precedes its page header.
         Returns a dict of header field metadata, a list of (active) cell-pointers,
         a list of freeblocks, and the starting offset of the content area.
+        Every pointer is bounds checked against the page (or the end of the data
+        if the page is truncated) and the freeblock chain must strictly ascend
+        (so cannot cycle). The page's work budget for the cell decoders is
+        reset here.
+        Raises PageParseError if the page structure is invalid. In hardened
+        mode a broken freeblock chain is instead recorded (see recordPageError)
+        and the freeblocks before the fault returned, so the active cells can
+        still be read.
         """
         pageheader = dict()
         celllist = list()
         freeblklist = list()
+        if pagesize == 1:
+            pagesize = 65536
+        self._pagestart = offset
+        self._pageend = min(offset + pagesize, self.dbend)
+        self._pagesize = pagesize
+        self._pagebudget = pagesize # every field and freeblock occupies at least one byte
 
         # Parse Page Header
-        self.dbfile.seek(offset)
-        pageheader['pagetype'] = ord(self.dbfile.read(1))
-        pageheader['freeblockofs'] = struct.unpack(">h",self.dbfile.read(2))[0]
-        pageheader['pagecellcount'] = struct.unpack(">h",self.dbfile.read(2))[0]
-        pageheader['contentareaofs'] = struct.unpack(">h",self.dbfile.read(2))[0]
-        pageheader['freebytefrags'] = ord(self.dbfile.read(1))
+        self.dbfile.seek(self._getPageHeaderOffset(offset))
+        rawheader = self.dbfile.read(8)
+        if len(rawheader) < 8:
+            raise PageParseError(offset, "page header truncated by end of file")
+        pageheader['pagetype'] = rawheader[0]
+        pageheader['freeblockofs'] = struct.unpack(">H",rawheader[1:3])[0]
+        pageheader['pagecellcount'] = struct.unpack(">H",rawheader[3:5])[0]
+        pageheader['contentareaofs'] = struct.unpack(">H",rawheader[5:7])[0]
+        pageheader['freebytefrags'] = rawheader[7]
+        if pageheader['contentareaofs'] == 0:
+            pageheader['contentareaofs'] = 65536
 
         # Parse Cell Pointer Array and note the start of cell content area
-        for ptr in range(0,pageheader['pagecellcount']):
-            celllist.append(struct.unpack(">h",self.dbfile.read(2))[0])
-        cellptrendofs = self.dbfile.tell() - offset
+        cellptrendofs = self.dbfile.tell() - offset + 2*pageheader['pagecellcount']
+        if cellptrendofs > pagesize:
+            raise PageParseError(offset, "cell count %s overruns page" % str(pageheader['pagecellcount']))
+        if not (cellptrendofs <= pageheader['contentareaofs'] <= pagesize):
+            raise PageParseError(offset, "content area offset %s outside page" % str(pageheader['contentareaofs']))
+        rawcellptrs = self.dbfile.read(2*pageheader['pagecellcount'])
+        if len(rawcellptrs) < 2*pageheader['pagecellcount']:
+            raise PageParseError(offset, "cell pointer array truncated by end of file")
+        for ptr in struct.unpack(">%sH" % str(pageheader['pagecellcount']),rawcellptrs):
+            if not (cellptrendofs <= ptr < pagesize):
+                raise PageParseError(offset, "cell pointer %s outside cell content area" % str(ptr))
+            celllist.append(ptr)
 
         # Get Freeblock offsets
-        self.dbfile.seek(offset+pageheader['freeblockofs'])
-        freeblkptr = pageheader['freeblockofs']
+        try:
+            self._getFreeblocks(offset,pageheader['freeblockofs'],cellptrendofs,self._pageend-offset,freeblklist)
+        except PageParseError as e:
+            if not self.hardened:
+                raise
+            # The page is read again for each export - record the fault once.
+            if offset not in self._freeblockfaults:
+                self._freeblockfaults.add(offset)
+                self.recordPageError(e, "Freeblock Chain")
+
+        return pageheader, celllist, freeblklist, cellptrendofs
+
+    def _getFreeblocks(self,offset,freeblkptr,cellptrendofs,pageend,freeblklist):
+        """
+        Follow a page's freeblock chain from its first freeblock pointer,
+        appending each freeblock's (relative) offset to freeblklist.
+        Pass the relative offset of the end of the page's data as pageend.
+        Raises PageParseError if a pointer is outside the page, the chain does
+        not strictly ascend, or the page's work budget runs out.
+        """
         while freeblkptr != 0:
+            if not (cellptrendofs <= freeblkptr <= pageend-4):
+                raise PageParseError(offset, "freeblock pointer %s outside page" % str(freeblkptr))
+            if freeblklist and freeblkptr <= freeblklist[-1]:
+                raise PageParseError(offset, "freeblock chain loops back to %s" % str(freeblkptr))
+            self._pagebudget -= 4
+            if self._pagebudget < 0:
+                raise PageParseError(offset, "work budget exhausted in freeblock chain")
             freeblklist.append(freeblkptr)
-            freeblkptr = struct.unpack(">h",self.dbfile.read(2))[0]
             self.dbfile.seek(offset+freeblkptr)
+            rawptr = self.dbfile.read(2)
+            if len(rawptr) < 2:
+                raise PageParseError(offset, "freeblock at %s truncated by end of file" % str(freeblkptr))
+            freeblkptr = struct.unpack(">H",rawptr)[0]
 
-        return pageheader, celllist, freeblklist, cellptrendofs
+    def _getPageHeaderOffset(self,offset):
+        """
+        Return the absolute offset of a page's B-tree header - past the 100
+        byte database header for page 1 (the page at the base offset), unless
+        the object is headerless.
+        """
+        if (offset == self.baseoffset) and not self.headerless:
+            return offset+100
+        return offset
 
     def _parseDBHeader(self):
         """
         Parse the SQLite 3 database header metadata and control information.
         Sets headerdict.
+        Returns bool (False if the file is shorter than the 100 byte header).
         """
+        self.dbfile.seek(self.baseoffset)
         rawheader = self.dbfile.read(100)
+        if len(rawheader) < 100:
+            return False
         unpackedheader = struct.unpack(self._dbheaderfmt,rawheader)
         self.headerdict = dict(zip(self._dictkeys,list(unpackedheader)))
         if (self.headerdict["readver"] == 2) or (self.headerdict["writever"] == 2):
             self.isWAL = True
+        return True
+
+    def _checkPageSize(self):
+        """
+        Check the header page size is 1 (65536) or a power of two from 512 to
+        32768 - anything else cannot be walked page by page.
+        Returns bool.
+        """
+        pagesize = self.headerdict["pagesize"]
+        return (pagesize == 1) or ((512 <= pagesize <= 32768) and not (pagesize & (pagesize-1)))
+
+    def getPageSize(self):
+        """
+        Return the page size in bytes. A stored value of 1 represents 65536.
+        """
+        if self.headerdict["pagesize"] == 1:
+            return 65536
+        return self.headerdict["pagesize"]
+
+    def _decodeText(self,rawtext):
+        """
+        Decode a TEXT value according to the database text encoding.
+        Returns str.
+        """
+        encoding = {2:"utf-16-le",3:"utf-16-be"}.get(self.headerdict["textencode"],"utf-8")
+        return rawtext.decode(encoding,"replace")
+
+    def _parseRecord(self,offset,followoverflow=True):
+        """
+        Parse a B-Tree Table Leaf Page Cell into typed values, given it's
+        starting absolute byte offset. The payload body is read in one pass and
+        each field decoded by serial type; TEXT is decoded using the database
+        text encoding and NULL fields are returned as None.
+        Pass absolute starting byte offset for the cell header, and optionally
+        False to cut the payload off at the page end rather than follow its
+        overflow chain.
+        Returns tuple(rowid, list of field values).
+        """
+        celldatalist = list()
+        cellheader,dataoffset,payloadlen,recordnum,payloadofs = self._parseCellHeader(offset)
+        data = self._readRecordBody(offset,dataoffset,payloadlen,payloadofs,sum([field[1] for field in cellheader]),followoverflow)
+        pos = 0
+        for fieldtype,length in cellheader:
+            decoder = self._serialdecoders.get(fieldtype)
+            if decoder is None:
+                celldatalist.append(fieldtype)
+            elif pos+length > len(data):
+                # Truncated (page end or broken overflow chain) - keep what
+                # there is of TEXT/BLOB.
+                if fieldtype == "ST_TEXT":
+                    celldatalist.append(self._decodeText(data[pos:]))
+                elif fieldtype == "ST_BLOB":
+                    celldatalist.append(data[pos:])
+                else:
+                    celldatalist.append(None)
+            elif fieldtype == "ST_TEXT":
+                celldatalist.append(self._decodeText(data[pos:pos+length]))
+            else:
+                celldatalist.append(decoder(data,pos,length))
+            pos+=length
+
+        return recordnum, celldatalist
+
+    def _readRecord(self,offset):
+        """
+        Read a B-Tree Table Leaf Page Cell without decoding its fields, given
+        it's starting absolute byte offset. Used by the compiled row decoders.
+        Returns tuple(rowid, list of raw serial types, payload body bytes).
+        """
+        serialtypes,dataoffset,payloadlen,recordnum,payloadofs = self._parseRawCellHeader(offset)
+        fixedtypes = self._fixedserialtypes
+        bodylen = sum([(serialtype-12) >> 1 if serialtype >= 12 else fixedtypes[serialtype][0] for serialtype in serialtypes])
+        return recordnum, serialtypes, self._readRecordBody(offset,dataoffset,payloadlen,payloadofs,bodylen)
+
+    def _readRecordBody(self,offset,dataoffset,payloadlen,payloadofs,bodylen,followoverflow=True):
+        """
+        Read the field data of a cell whose header has been parsed, in one
+        pass. Within a page the field lengths are checked against the payload
+        length and the body is read through _readPayload.
+        Returns the payload body bytes (possibly truncated).
+        """
+        if self._pageend is not None:
+            if bodylen > payloadlen:
+                raise PageParseError(self._pagestart, "cell at %s has field lengths exceeding its payload" % str(offset))
+            return self._readPayload(payloadofs,payloadlen,followoverflow)[dataoffset-payloadofs:dataoffset-payloadofs+bodylen]
+        self.dbfile.seek(dataoffset)
+        return self.dbfile.read(bodylen)
+
+    def _readPayload(self,payloadofs,payloadlen,followoverflow=True):
+        """
+        Read a table leaf cell's payload, following its overflow page chain if
+        the payload does not fit in the page (local size rules from
+        http://www.sqlite.org/fileformat.html). The chain is only followed for
+        databases with a valid header (not orphaned pages), stops at pages
+        outside the database or already visited, and otherwise (or if
+        followoverflow is False) the payload is cut off at the page end.
+        Pass the absolute offset of the payload and its length.
+        Returns the payload byte string.
+        """
+        pagesize = self._pagesize
+        usable = pagesize - (self.headerdict["resspace"] & 0xFF if self.checkSignature() else 0)
+        maxlocal = usable - 35
+        if payloadlen <= maxlocal:
+            self.dbfile.seek(payloadofs)
+            return self.dbfile.read(max(0, min(payloadlen, self._pageend - payloadofs)))
+
+        minlocal = ((usable-12)*32//255)-23
+        locallen = minlocal + (payloadlen-minlocal) % (usable-4)
+        if locallen > maxlocal:
+            locallen = minlocal
+        self.dbfile.seek(payloadofs)
+        payload = [self.dbfile.read(max(0, min(locallen, self._pageend - payloadofs)))]
+        if (len(payload[0]) < locallen) or not followoverflow or not self.checkSignature():
+            return payload[0]
+        overflowpage = struct.unpack(">I",(self.dbfile.read(4)+b"\x00"*4)[:4])[0]
+        remaining = payloadlen - locallen
+        visited = set()
+        while (remaining > 0) and (overflowpage != 0) and (overflowpage not in visited):
+            visited.add(overflowpage)
+            overflowofs = self.baseoffset + (overflowpage-1)*pagesize
+            if (overflowpage < 2) or (overflowofs + pagesize > self.dbend):
+                break
+            self.dbfile.seek(overflowofs)
+            rawoverflow = self.dbfile.read(usable)
+            if len(rawoverflow) < 4:
+                break
+            overflowpage = struct.unpack(">I",rawoverflow[0:4])[0]
+            payload.append(rawoverflow[4:4+min(remaining,usable-4)])
+            remaining -= usable-4
+        return b"".join(payload)
 
     def _parseCell(self,offset):
         """
-        Parse a B-Tree Leaf Page Cell, given it's starting absolute byte offset.
+        Parse a B-Tree Leaf Page Cell, given it's starting absolute byte offset,
+        without any knowledge of the owning table's schema.
         Pass absolute starting byte offset for the cell header.
         Returns the parsed cell as a list in the form:
+        [rowid, field value, field value, ...]
+        """
+        recordnum, celldatalist = self._parseRecord(offset)
+        celldatalist.insert(0,recordnum)
+        return celldatalist
+
+    # A column name - double, back or square bracket quoted (or a string
+    # literal, which SQLite also accepts) or bare.
+    _identifierpattern = r'("[^"]*"|`[^`]*`|\[[^\]]*\]|\'[^\']*\'|[^\s(),]+)'
 
+    def _parseCreateTable(self,sql):
         """
-        celldatalist = list()
-        cellheader,dataoffset,payloadlen,recordnum = self._parseCellHeader(offset)
-
-        for field in cellheader:
-            if field[0] == "NULL":
-                celldatalist.append(recordnum)
-            elif field[0] == "ST_INT8":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(ord(struct.unpack(">c",self.dbfile.read(1))[0]))
-                dataoffset+=field[1]
-            elif field[0] == "ST_INT16":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(struct.unpack(">h",self.dbfile.read(2))[0])
-                dataoffset+=field[1]
-            elif field[0] == "ST_INT24":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append("ST_INT24 - NOT IMPLEMENTED!") # NOT IMPLEMENTED YET!
-                dataoffset+=field[1]
-            elif field[0] == "ST_INT32":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(struct.unpack(">i",self.dbfile.read(4))[0])
-                dataoffset+=field[1]
-            elif field[0] == "ST_INT48":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append("ST_INT48 - NOT IMPLEMENTED!") # NOT IMPLEMENTED YET!
-                dataoffset+=field[1]
-            elif field[0] == "ST_INT64":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(struct.unpack(">q",self.dbfile.read(8))[0])
-                dataoffset+=8
-            elif field[0] == "ST_FLOAT":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(struct.unpack(">d",self.dbfile.read(8))[0])
-                dataoffset+=8
-            elif field[0] == "ST_C0":
-                celldatalist.append("ST_C0 - NOT IMPLEMENTED!") # NOT IMPLEMENTED YET!
-            elif field[0] == "ST_C1":
-                celldatalist.append("ST_C0 - NOT IMPLEMENTED!") # NOT IMPLEMENTED YET!
-            elif field[0] == "ST_BLOB":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(self.dbfile.read(field[1]))
-                dataoffset+=field[1]
-            elif field[0] == "ST_TEXT":
-                self.dbfile.seek(dataoffset)
-                celldatalist.append(struct.unpack("%ss" % str(field[1]),self.dbfile.read(field[1]))[0])
-                dataoffset+=field[1]
+        Parse the column definitions out of a CREATE TABLE statement.
+        Column affinity is derived from the declared type using the rules at
+        http://www.sqlite.org/datatype3.html. An INTEGER PRIMARY KEY column is
+        flagged as the rowid alias.
+        Pass the SQL statement from sqlite_master.
+        Returns list of tuples in the form [(name,affinity,isrowidalias),...]
+        or None for statements without a rowid B-tree (virtual tables,
+        WITHOUT ROWID tables) or which cannot be parsed.
+        """
+        if sql is None or not re.match(r'\s*CREATE\s+(TEMP\s+|TEMPORARY\s+)?TABLE\b', sql, re.I):
+            return None
+        start = sql.find("(")
+        end = sql.rfind(")")
+        if (start == -1) or (end <= start):
+            return None # CREATE TABLE ... AS SELECT
+        if re.search(r'WITHOUT\s+ROWID', sql[end:], re.I):
+            return None
+
+        # Split the definition list on top-level commas.
+        definitions = list()
+        depth = 0
+        quote = None
+        current = ""
+        for char in sql[start+1:end]:
+            if quote is not None:
+                if char == quote:
+                    quote = None
+            elif char in "\"'`[":
+                quote = "]" if char == "[" else char
+            elif char == "(":
+                depth+=1
+            elif char == ")":
+                depth-=1
+            elif (char == ",") and (depth == 0):
+                definitions.append(current.strip())
+                current = ""
+                continue
+            current+=char
+        definitions.append(current.strip())
+
+        columns = list()
+        pkcolumns = list()
+        for definition in definitions:
+            constraint = re.match(r'(CONSTRAINT\s+\S+\s+)?(PRIMARY\s+KEY|UNIQUE|CHECK|FOREIGN\s+KEY)\b', definition, re.I)
+            if constraint:
+                if constraint.group(2).upper().startswith("PRIMARY"):
+                    # Each indexed column is a (possibly quoted) name followed by
+                    # optional COLLATE/ASC/DESC - take the name, then unquote it.
+                    pkcolumns = list()
+                    for col in definition[definition.find("(")+1:definition.rfind(")")].split(","):
+                        colmatch = re.match(self._identifierpattern, col.strip(), re.S)
+                        if colmatch:
+                            pkcolumns.append(colmatch.group(1).strip("\"'`[]"))
+                continue
+            namematch = re.match(self._identifierpattern + r'\s*(.*)', definition, re.S)
+            if not namematch:
+                continue
+            name = namematch.group(1).strip("\"'`[]")
+            declaration = namematch.group(2)
+            coltype = re.split(r'\b(CONSTRAINT|PRIMARY|NOT|NULL|UNIQUE|CHECK|DEFAULT|COLLATE|REFERENCES|GENERATED|AS)\b', declaration, maxsplit=1, flags=re.I)[0].strip().upper()
+            if "INT" in coltype:
+                affinity = "INTEGER"
+            elif ("CHAR" in coltype) or ("CLOB" in coltype) or ("TEXT" in coltype):
+                affinity = "TEXT"
+            elif ("BLOB" in coltype) or (coltype == ""):
+                affinity = "BLOB"
+            elif ("REAL" in coltype) or ("FLOA" in coltype) or ("DOUB" in coltype):
+                affinity = "REAL"
             else:
-                print field[0]
+                affinity = "NUMERIC"
+            isalias = (coltype == "INTEGER") and bool(re.search(r'PRIMARY\s+KEY(?!\s+DESC)', declaration, re.I))
+            columns.append([name, affinity, isalias, coltype])
 
-        return celldatalist
+        # As with the inline form, only a declared type of exactly INTEGER
+        # makes a table-level PRIMARY KEY column the rowid alias.
+        if len(pkcolumns) == 1:
+            for column in columns:
+                if (column[0].lower() == pkcolumns[0].lower()) and (column[3] == "INTEGER"):
+                    column[2] = True
+
+        return [tuple(column[:3]) for column in columns]
+
+    def _compileRowDecoder(self,columns):
+        """
+        Build a row decoder for one table from its parsed columns (see
+        _parseCreateTable). Fields are decoded straight from their raw serial
+        types (no generic serial type names or decoder lookups), with each
+        column's converter - REAL affinity turns stored integers back into
+        floats - and the rowid alias position resolved once here rather than
+        per field. Records with fewer fields than columns (columns added by
+        ALTER TABLE) are padded with None.
+        Returns a function taking a cell's absolute offset and returning the
+        list [rowid, column value, column value, ...].
+        """
+        columncount = len(columns)
+        aliasindex = None
+        converters = list()
+        for i, column in enumerate(columns):
+            if column[2]:
+                aliasindex = i+1
+            converters.append(float if column[1] == "REAL" else None)
+        fixedtypes = self._fixedserialtypes
+        readRecord = self._readRecord
+        decodeText = self._decodeText
+
+        def decodeRow(offset):
+            recordnum, serialtypes, data = readRecord(offset)
+            values = [recordnum]
+            datalen = len(data)
+            pos = 0
+            for i, serialtype in enumerate(serialtypes):
+                if serialtype >= 12:
+                    # Truncated (page end or broken overflow chain) TEXT/BLOB
+                    # keeps what there is.
+                    length = (serialtype-12) >> 1
+                    if serialtype & 1:
+                        values.append(decodeText(data[pos:pos+length]))
+                    else:
+                        values.append(data[pos:pos+length])
+                else:
+                    length, decoder = fixedtypes[serialtype]
+                    if decoder is None:
+                        values.append("Reserved: %s" % str(serialtype))
+                    elif pos+length > datalen:
+                        values.append(None)
+                    elif (i < columncount) and (converters[i] is not None) and (serialtype != 0):
+                        values.append(converters[i](decoder(data,pos))) # stored as integer to save space
+                    else:
+                        values.append(decoder(data,pos))
+                pos+=length
+            if len(values) <= columncount:
+                values.extend([None]*(columncount+1-len(values)))
+            if aliasindex is not None and values[aliasindex] is None:
+                values[aliasindex] = recordnum
+            return values
+
+        return decodeRow
+
+    def _walkBTree(self,rootpage):
+        """
+        Walk a table or index B-tree from its root page number, visiting pages
+        in key order. Pages already visited, outside the database or with an
+        invalid cell count are skipped, as are child pointers past the end of
+        the data.
+        Pass the root page number from sqlite_master.
+        Returns a list of tuples in the form
+        [(page absolute starting offset,page type,cell count),...].
+        """
+        pagesize = self.getPageSize()
+        pagelist = list()
+        visited = set()
+        stack = [rootpage]
+        while stack:
+            pagenum = stack.pop()
+            if (pagenum < 1) or (pagenum in visited):
+                continue
+            visited.add(pagenum)
+            offset = self.baseoffset + (pagenum-1)*pagesize
+            if offset >= self.dbend:
+                continue
+            hdrofs = offset+100 if pagenum == 1 else offset
+            self.dbfile.seek(hdrofs)
+            pageheader = self.dbfile.read(12)
+            if len(pageheader) < 8:
+                continue
+            pagetype = pageheader[0]
+            cellcount = struct.unpack(">H",pageheader[3:5])[0]
+            if pagetype in (10,13):
+                pagelist.append((offset,pagetype,cellcount))
+            elif (pagetype in (2,5)) and (len(pageheader) == 12):
+                rawcellptrs = self.dbfile.read(2*cellcount)
+                if (hdrofs-offset+12+2*cellcount > pagesize) or (len(rawcellptrs) < 2*cellcount):
+                    logging.warning("WARNING: Skipping interior page with invalid cell count at offset %s" % str(offset))
+                    continue
+                childlist = list()
+                for cellptr in struct.unpack(">%sH" % str(cellcount),rawcellptrs):
+                    if (cellptr > pagesize-4) or (offset+cellptr+4 > self.dbend):
+                        continue
+                    self.dbfile.seek(offset+cellptr)
+                    rawchild = self.dbfile.read(4)
+                    if len(rawchild) < 4:
+                        continue
+                    childlist.append(struct.unpack(">I",rawchild)[0])
+                childlist.append(struct.unpack(">I",pageheader[8:12])[0]) # right-most pointer
+                stack.extend(reversed(childlist))
+                pagelist.append((offset,pagetype,cellcount))
+        return pagelist
+
+    def getTableLeafPages(self,rootpage):
+        """
+        Walk a table B-tree from its root page number and collect its leaf
+        pages in key order.
+        Pass the root page number from sqlite_master.
+        Returns a list of leaf page absolute starting offsets.
+        """
+        return [page[0] for page in self._walkBTree(rootpage) if page[1] == 13]
+
+    def getRowCount(self,rootpage):
+        """
+        Count the entries in a table or index B-tree (equivalent to
+        SELECT count(*)) by summing the cell counts of its pages. Interior
+        index pages hold entries too; interior table pages hold only keys.
+        Pass the root page number from sqlite_master.
+        Returns int.
+        """
+        return sum([page[2] for page in self._walkBTree(rootpage) if page[1] != 5])
+
+    @property
+    def tables(self):
+        """
+        Decoding layout of every rowid table in the schema, built on first
+        access and cached. Each entry is a dict with the table 'name', its
+        'columns' (see _parseCreateTable), its 'leafpages' offsets and a
+        compiled row 'decoder'.
+        """
+        if self._tables is None:
+            tables = list()
+            for element in self.schema:
+                if (element[0] != "table") or not element[3]:
+                    continue
+                columns = self._parseCreateTable(element[4])
+                if columns is None:
+                    continue
+                tables.append({'name':element[1],
+                               'columns':columns,
+                               'leafpages':self.getTableLeafPages(element[3]),
+                               'decoder':self._compileRowDecoder(columns)})
+            self._tables = tables
+        return self._tables
 
     def _parseCellHeader(self,offset):
         """
         Parse a B-Tree Leaf Page Cell Header, given it's starting absolute byte
-        offset.
+        offset, naming each field's serial type.
         Pass absolute starting byte offset for the cell header to be decoded.
         Returns tuple containing a list of tuples in the form
-        [(String type,int length),...], and the starting offset of the payload
-        fields.
+        [(String type,int length),...], the starting offset of the payload
+        fields, the payload length, the record number (rowid), and the starting
+        offset of the payload (its header).
         """
         headerlist = list()
-
-        # Payload length
-        payloadlen,length = self._getVarIntOfs(offset)
-        offset+=length
-        # Record Number
-        recordnum,length = self._getVarIntOfs(offset)
-        offset+=length
-        # Payload Header Length
-        payloadheaderlen,length = self._getVarIntOfs(offset)
-        payloadheaderlenofs = offset + payloadheaderlen
-        offset+=length
-        # Payload Fields
-        while offset < (payloadheaderlenofs):
-            fieldtype,length = self._getVarIntOfs(offset)
+        serialtypes,offset,payloadlen,recordnum,payloadofs = self._parseRawCellHeader(offset)
+        for fieldtype in serialtypes:
             # Determine Serial Type
             if fieldtype == 0:
                 headerlist.append(("NULL",0))
@@ -214,14 +727,48 @@ class NotionalSQLite:
                 headerlist.append(("ST_C1",0))
             elif fieldtype > 11:
                 if (fieldtype%2) == 0:
-                    headerlist.append(("ST_BLOB",(fieldtype-12)/2))
+                    headerlist.append(("ST_BLOB",(fieldtype-12)//2))
                 else:
-                    headerlist.append(("ST_TEXT",(fieldtype-13)/2))
+                    headerlist.append(("ST_TEXT",(fieldtype-13)//2))
             else:
                 headerlist.append(("Reserved: %s" % str(fieldtype),0))
+
+        return headerlist, offset, payloadlen, recordnum, payloadofs
+
+    def _parseRawCellHeader(self,offset):
+        """
+        As with _parseCellHeader, but each field is returned as its raw serial
+        type number.
+        Returns tuple containing a list of serial types, the starting offset of
+        the payload fields, the payload length, the record number (rowid), and
+        the starting offset of the payload (its header).
+        """
+        serialtypes = list()
+
+        # Payload length
+        payloadlen,length = self._getVarIntOfs(offset)
+        offset+=length
+        # Record Number
+        recordnum,length = self._getVarIntOfs(offset)
+        offset+=length
+        payloadofs = offset
+        # Payload Header Length
+        payloadheaderlen,length = self._getVarIntOfs(offset)
+        payloadheaderlenofs = offset + payloadheaderlen
+        offset+=length
+        if (self._pageend is not None) and (payloadheaderlenofs > self._pageend):
+            raise PageParseError(self._pagestart, "cell header at %s overruns page" % str(offset))
+        # Payload Fields
+        while offset < (payloadheaderlenofs):
+            if self._pagebudget is not None:
+                self._pagebudget -= 1
+                if self._pagebudget < 0:
+                    raise PageParseError(self._pagestart, "work budget exhausted in cell headers")
+            fieldtype,length = self._getVarIntOfs(offset)
+            serialtypes.append(fieldtype)
             offset+=length
 
-        return headerlist, offset, payloadlen, recordnum
+        return serialtypes, offset, payloadlen, recordnum, payloadofs
 
     def _getVarIntOfs(self,offset):
         """
@@ -234,24 +781,28 @@ class NotionalSQLite:
 
         Pass starting byte offset to decode.
         Returns tuple(VarInt value and the VarInt length).
+        Raises PageParseError if the VarInt runs past the end of the current
+        page (or the file) or beyond 9 bytes.
         """
+        if self._pageend is not None:
+            maxlen = min(9, self._pageend - offset)
+        else:
+            maxlen = 9
         self.dbfile.seek(offset)
+        rawvarint = self.dbfile.read(max(maxlen, 0))
         varintlen = varintval = 0
 
+        # Decoded in the same pass that finds the terminating byte.
         while True:
-            if((ord(self.dbfile.read(1))&(1<<7))!=0):
-                varintlen+=1
+            if varintlen >= len(rawvarint):
+                raise PageParseError(self._pagestart, "VarInt at %s runs past page end" % str(offset))
+            byteval = rawvarint[varintlen]
+            varintlen+=1
+            if (byteval&(1<<7))!=0:
+                varintval = (varintval<<7) + (byteval - 128)
             else:
-                varintlen+=1
+                varintval = (varintval<<7) + byteval
                 break
-        self.dbfile.seek(offset)
-        for i in reversed(range(0,varintlen)):
-            if (i == 0):
-                byteval = ord(self.dbfile.read(1))
-                varintval+=byteval
-            else:
-                byteval = ord(self.dbfile.read(1))
-                varintval+=(byteval - 128)*(2**(i*7))
 
         return varintval,varintlen
 
@@ -269,10 +820,10 @@ class NotionalSQLite:
 
         for i in reversed(range(0,varintlen)):
             if (i == 0):
-                byteval = ord(bytestring[bytestringpos])
+                byteval = bytestring[bytestringpos]
                 varintval+=byteval
             else:
-                byteval = ord(bytestring[bytestringpos])
+                byteval = bytestring[bytestringpos]
                 varintval+=(byteval - 128)*(2**(i*7))
             bytestringpos+=1
 
@@ -289,12 +840,11 @@ class NotionalSQLite:
         pagedict['leafindex'] = list()
         pagedict['leaftable'] = list()
         pagedict['overflow'] = list()
-        offset = 0
-        filesize = os.path.getsize(self.dbfile.name)
+        offset = self.baseoffset
 
-        while (offset < filesize):
+        while (offset < self.dbend):
             self.dbfile.seek(offset)
-            flag = ord(self.dbfile.read(1))
+            flag = self.dbfile.read(1)[0]
             if (flag == 2):
                 pagedict['intindex'].append(offset)
             elif (flag == 5):
@@ -308,37 +858,156 @@ class NotionalSQLite:
             elif (flag == 0):
                 pagedict['overflow'].append(offset)
             else:
-                print "Invalid Page Type: %s (%s)" % (str(flag), str(offset))
+                print("Invalid Page Type: %s (%s)" % (str(flag), str(offset)))
             offset+=pagesize
         return pagedict
 
-    def getActiveRowContent(self, offset, pagesize):
+    def recordPageError(self, error, stage):
         """
-        Return a list of lists containing the content of all active cells in the
-        page.
+        Handle a PageParseError raised while processing many pages. In hardened
+        mode the failure is recorded in pageerrors in the form
+        [page offset,stage,reason] and processing can continue; otherwise the
+        error is re-raised.
         """
+        if not self.hardened:
+            raise error
+        logging.debug("Page parse error (%s): %s" % (stage, error))
+        self.pageerrors.append([error.offset, stage, error.reason])
+
+    def getActiveCellContent(self, offset, pagesize, decoder=None):
+        """
+        As with getActiveRowContent, but each cell's content is paired with the
+        cell's absolute starting offset. In hardened mode a cell which fails to
+        decode is recorded (see recordPageError) and skipped, and the rest of
+        the page is still returned.
+        Returns a list of tuples in the form [(cell offset,[content]),...].
+        """
+        if decoder is None:
+            decoder = self._parseCell
         cellcontentlist = list()
         a,celllist,c,d = self._parseTableLeafPageHeader(offset,pagesize)
         for cell in celllist:
-            cellcontentlist.append(self._parseCell(offset+cell))
+            try:
+                cellcontentlist.append((offset+cell,decoder(offset+cell)))
+            except PageParseError as e:
+                self.recordPageError(PageParseError(e.offset, "cell at %s: %s" % (str(offset+cell),e.reason)), "Active Cell")
         return cellcontentlist
 
+    def getActiveRowContent(self, offset, pagesize, decoder=None):
+        """
+        Return a list of lists containing the content of all active cells in the
+        page. Pass the owning table's compiled decoder (see the tables property)
+        to get its typed columns; otherwise cells are decoded generically.
+        """
+        return [content for cell, content in self.getActiveCellContent(offset,pagesize,decoder)]
+
     def getUnallocContent(self, offset, pagesize):
         """
         Return a list of lists containing the content of all unallocated areas
         in the page. All non-printable chars are stripped.
+        Raises PageParseError if the page structure is invalid.
         """
         unalloclist = list()
         pageheader, celllist, freeblklist, cellptrendofs = self._parseTableLeafPageHeader(offset,pagesize)
+        pageend = self._pageend - offset
         self.dbfile.seek(offset+cellptrendofs)
         length = pageheader['contentareaofs']-cellptrendofs
         unalloclist.append([offset+cellptrendofs,"Unallocated",length,self._strip_nonprintable(self.dbfile.read(length))])
         for freeblk in freeblklist:
             self.dbfile.seek(offset+freeblk+2) # skip past the 2-byte next freeblock ptr
-            freeblklen = struct.unpack(">H",self.dbfile.read(2))[0]
+            rawlen = self.dbfile.read(2)
+            if len(rawlen) < 2:
+                raise PageParseError(offset, "freeblock at %s truncated by end of file" % str(freeblk))
+            freeblklen = struct.unpack(">H",rawlen)[0]
+            if not (4 <= freeblklen <= pageend-freeblk):
+                raise PageParseError(offset, "freeblock at %s has invalid length %s" % (str(freeblk),str(freeblklen)))
             unalloclist.append([offset+freeblk,"Free Block",freeblklen,self._strip_nonprintable(self.dbfile.read(freeblklen-4))])
         return unalloclist
 
+    def _getRowsForPages(self,pagelist):
+        """
+        Decode the active rows of the table leaf pages among the given page
+        offsets, using the owning table's decoder where the schema is readable.
+        Returns a dict in the form {(table name,rowid):(page offset,[values]),...}
+        where rows on pages not reachable from any table use the name None.
+        """
+        pagetables = dict()
+        try:
+            for table in self.tables:
+                for page in table['leafpages']:
+                    pagetables[page] = table
+        except PageParseError:
+            pass
+
+        rowdict = dict()
+        pagesize = self.getPageSize()
+        for page in pagelist:
+            self.dbfile.seek(self._getPageHeaderOffset(page))
+            if self.dbfile.read(1) != b"\x0d":
+                continue
+            table = pagetables.get(page)
+            try:
+                if table is None:
+                    for row in self.getActiveRowContent(page,pagesize):
+                        rowdict[(None,row[0])] = (page,row[1:])
+                else:
+                    for row in self.getActiveRowContent(page,pagesize,table['decoder']):
+                        rowdict[(table['name'],row[0])] = (page,row[1:])
+            except PageParseError as e:
+                self.recordPageError(e, "Diff Rows")
+        return rowdict
+
+    def diffRows(self,other,pagelist):
+        """
+        Compare the active rows on the given (changed) pages of this database
+        against a later snapshot of it, matching rows by table and rowid.
+        Pass the later snapshot's NotionalSQLite object and the page offsets
+        from diffPages().
+        Returns a list of lists in the form
+        [[change,table name,rowid,page offset,values],...] where change is
+        "Added", "Removed" or "Modified" (the later values are reported).
+        """
+        before = self._getRowsForPages(pagelist)
+        after = other._getRowsForPages(pagelist)
+        difflist = list()
+        for key in sorted(set(before) | set(after), key=lambda key: (key[0] or "", key[1])):
+            if key not in before:
+                difflist.append(["Added",key[0],key[1],after[key][0],after[key][1]])
+            elif key not in after:
+                difflist.append(["Removed",key[0],key[1],before[key][0],before[key][1]])
+            elif before[key][1] != after[key][1]:
+                difflist.append(["Modified",key[0],key[1],after[key][0],after[key][1]])
+        return difflist
+
+    def diffFreeblocks(self,other,pagelist):
+        """
+        Find freeblocks in a later snapshot of this database which are not
+        present (at the same offset and length) in this one.
+        Pass the later snapshot's NotionalSQLite object and the page offsets
+        from diffPages().
+        Returns a list of lists in the same form as getUnallocContent().
+        """
+        pagesize = self.getPageSize()
+        newlist = list()
+        for page in pagelist:
+            other.dbfile.seek(other._getPageHeaderOffset(page))
+            if other.dbfile.read(1) != b"\x0d":
+                continue
+            existing = set()
+            self.dbfile.seek(self._getPageHeaderOffset(page))
+            try:
+                if self.dbfile.read(1) == b"\x0d":
+                    existing = set([(row[0],row[2]) for row in self.getUnallocContent(page,pagesize) if row[1] == "Free Block"])
+            except PageParseError as e:
+                self.recordPageError(e, "Diff Freeblocks")
+            try:
+                for row in other.getUnallocContent(page,pagesize):
+                    if (row[1] == "Free Block") and ((row[0],row[2]) not in existing):
+                        newlist.append(row)
+            except PageParseError as e:
+                other.recordPageError(e, "Diff Freeblocks")
+        return newlist
+
     def mapPages(self,pagesize):
         """
         Debugging method to give a visual representation of the distribution of
@@ -354,11 +1023,11 @@ class NotionalSQLite:
         """
         offset = intindex = inttbl = leafindex = leaftbl = headercnt = overflow = 0
         pagemap = ""
-        filesize = os.path.getsize(self.dbfile.name)
+        offset = self.baseoffset
 
-        while (offset < filesize):
+        while (offset < self.dbend):
             self.dbfile.seek(offset)
-            flag = ord(self.dbfile.read(1))
+            flag = self.dbfile.read(1)[0]
             if (flag == 2):
                 pagemap+="i"
                 intindex+=1
@@ -381,12 +1050,51 @@ class NotionalSQLite:
         total = intindex + inttbl + leafindex + leaftbl + headercnt + overflow
         return (pagemap,intindex,inttbl,leafindex,leaftbl,headercnt,overflow,total)
 
+    def triage(self):
+        """
+        Fast triage of the database using only the 100 byte header and page 1.
+        No sqlite3 connection is made and no other pages are read - overflow
+        chains of long sqlite_master records are not followed.
+        Returns a dict of triage values. If page 1 is an interior page, only the
+        header values are populated and 'schemacomplete' is False.
+        """
+        triagedict = dict()
+        triagedict['sigvalid'] = self.checkSignature()
+        triagedict['pagesize'] = self.getPageSize()
+        triagedict['textencode'] = {1:"UTF-8",2:"UTF-16LE",3:"UTF-16BE"}.get(self.headerdict["textencode"],"Invalid")
+        triagedict['wal'] = self.isWAL
+        triagedict['totalfreepage'] = self.headerdict["totalfreepage"]
+        triagedict['slack'] = self.headerdict["totalfreepage"] * triagedict['pagesize']
+        triagedict['tables'] = list()
+        triagedict['schemacomplete'] = False
+
+        if not triagedict['sigvalid']:
+            return triagedict
+
+        self.dbfile.seek(self.baseoffset+100)
+        if self.dbfile.read(1) != b"\x0d":
+            return triagedict
+        a,celllist,c,d = self._parseTableLeafPageHeader(self.baseoffset,triagedict['pagesize'])
+        for cell in celllist:
+            recordnum, element = self._parseRecord(self.baseoffset+cell,False)
+            if len(element) >= 2 and element[0] == "table":
+                triagedict['tables'].append(element[1])
+        triagedict['schemacomplete'] = True
+        return triagedict
+
+    def close(self):
+        """
+        Close the underlying database file handle.
+        """
+        if self.dbfile is not None:
+            self.dbfile.close()
+
     def checkSignature(self):
         """
         Convenience function to perform signature check.
         Returns bool.
         """
-        if self.headerdict["sig"] == "SQLite format 3\x00":
+        if self.headerdict["sig"] == b"SQLite format 3\x00":
             return True
         else:
             return False
@@ -397,118 +1105,365 @@ class NotionalSQLite:
         the format spec at: http://www.sqlite.org/fileformat.html
         Returns Dict.
         """
+        if self._headertransdict is not None:
+            return self._headertransdict
+        self._headertransdict = dict()
     # Magic Header String
-        if self.headerdict["sig"] == 'SQLite format 3\x00':
-            self.headertransdict["sig"] = self.headerdict["sig"]
+        if self.headerdict["sig"] == b'SQLite format 3\x00':
+            self._headertransdict["sig"] = self.headerdict["sig"].rstrip(b"\x00").decode("ascii")
         else:
-            self.headertransdict["sig"] = ("Invalid Signature")
+            self._headertransdict["sig"] = ("Invalid Signature")
     # Page Size
-        if self.headerdict["pagesize"] == -32768:
-            self.headertransdict["pagesize"] = "65536 - SQLite v.3.7.1 or greater"
+        if self.headerdict["pagesize"] == 1:
+            self._headertransdict["pagesize"] = "65536 - SQLite v.3.7.1 or greater"
         else:
-            self.headertransdict["pagesize"] = str(self.headerdict["pagesize"])
+            self._headertransdict["pagesize"] = str(self.headerdict["pagesize"])
     # File format version numbers
         if (self.headerdict["writever"] > 2) and (self.headerdict["readver"] in (1,2)):
-            self.headertransdict["writever"] = "READ-ONLY"
+            self._headertransdict["writever"] = "READ-ONLY"
             if self.headerdict["readver"] == 1:
-                self.headertransdict["readver"] = "Legacy - Roll Back Journalling"
+                self._headertransdict["readver"] = "Legacy - Roll Back Journalling"
             else:
-                self.headertransdict["readver"] = "WAL - Write Ahead Log Journalling"
+                self._headertransdict["readver"] = "WAL - Write Ahead Log Journalling"
         elif (self.headerdict["readver"] > 2):
-            self.headertransdict["readver"] = "Read and Write Disabled."
+            self._headertransdict["readver"] = "Read and Write Disabled."
             if self.headerdict["writever"] == 1:
-                self.headertransdict["writever"] = "Legacy - Roll Back Journalling"
+                self._headertransdict["writever"] = "Legacy - Roll Back Journalling"
             else:
-                self.headertransdict["writever"] = "WAL - Write Ahead Log Journalling"
+                self._headertransdict["writever"] = "WAL - Write Ahead Log Journalling"
         elif (self.headerdict["writever"] in (1,2)) and (self.headerdict["readver"] in (1,2)):
             if self.headerdict["readver"] == 1:
-                self.headertransdict["readver"] = "Legacy - Roll Back Journalling"
+                self._headertransdict["readver"] = "Legacy - Roll Back Journalling"
             else:
-                self.headertransdict["readver"] = "WAL - Write Ahead Log Journalling"
+                self._headertransdict["readver"] = "WAL - Write Ahead Log Journalling"
             if self.headerdict["writever"] == 1:
-                self.headertransdict["writever"] = "Legacy - Roll Back Journalling"
+                self._headertransdict["writever"] = "Legacy - Roll Back Journalling"
             else:
-                self.headertransdict["writever"] = "WAL - Write Ahead Log Journalling"
+                self._headertransdict["writever"] = "WAL - Write Ahead Log Journalling"
         else:
-            self.headertransdict["readver"] = "Invalid Value: %s" % self.headerdict["readver"]
-            self.headertransdict["writever"] = "Invalid Value: %s" % self.headerdict["writever"]
+            self._headertransdict["readver"] = "Invalid Value: %s" % self.headerdict["readver"]
+            self._headertransdict["writever"] = "Invalid Value: %s" % self.headerdict["writever"]
     # Reserved bytes per page
-        self.headertransdict["resspace"] = str(self.headerdict["resspace"])
+        self._headertransdict["resspace"] = str(self.headerdict["resspace"])
     # Payload fractions
         if (self.headerdict["maxpayload"] == 64):
-            self.headertransdict["maxpayload"] = "64"
+            self._headertransdict["maxpayload"] = "64"
         else:
-            self.headertransdict["maxpayload"] = "Invalid value: %s" % str(headerdict["maxpayload"])
+            self._headertransdict["maxpayload"] = "Invalid value: %s" % str(self.headerdict["maxpayload"])
         if (self.headerdict["minpayload"] == 32):
-            self.headertransdict["minpayload"] = "32"
+            self._headertransdict["minpayload"] = "32"
         else:
-            self.headertransdict["minpayload"] = "Invalid value: %s" % str(headerdict["minpayload"])
+            self._headertransdict["minpayload"] = "Invalid value: %s" % str(self.headerdict["minpayload"])
         if (self.headerdict["leafpayload"] == 32):
-            self.headertransdict["leafpayload"] = "32"
+            self._headertransdict["leafpayload"] = "32"
         else:
-            self.headertransdict["leafpayload"] = "Invalid value: %s" % str(headerdict["leafpayload"])
+            self._headertransdict["leafpayload"] = "Invalid value: %s" % str(self.headerdict["leafpayload"])
     # File change counter
-        self.headertransdict["changecount"] = str(self.headerdict["changecount"])
+        self._headertransdict["changecount"] = str(self.headerdict["changecount"])
         if self.isWAL:
-            self.headertransdict["changecount"] += " (WAL enabled - value may be inaccurate.)"
+            self._headertransdict["changecount"] += " (WAL enabled - value may be inaccurate.)"
     # In-header Database Size
         if (self.headerdict["changecount"] == self.headerdict["validfor"]) and (self.headerdict["dbsize"] > 0):
-            self.headertransdict["dbsize"] = str(self.headerdict["dbsize"]) + " page(s)"
+            self._headertransdict["dbsize"] = str(self.headerdict["dbsize"]) + " page(s)"
         else:
-            self.headertransdict["dbsize"] = "Invalid value: %s" % str(self.headerdict["dbsize"])
+            self._headertransdict["dbsize"] = "Invalid value: %s" % str(self.headerdict["dbsize"])
     # Free Page List page number
-        self.headertransdict["freepagelist"] = str(self.headerdict["freepagelist"])
+        self._headertransdict["freepagelist"] = str(self.headerdict["freepagelist"])
     # Total Free Pages
-        self.headertransdict["totalfreepage"] = str(self.headerdict["totalfreepage"])
+        self._headertransdict["totalfreepage"] = str(self.headerdict["totalfreepage"])
     # Schema cookie
-        self.headertransdict["schemacookie"] = str(self.headerdict["schemacookie"])
+        self._headertransdict["schemacookie"] = str(self.headerdict["schemacookie"])
     # Schema Format number
         if self.headerdict["schemanum"] == 1:
-            self.headertransdict["schemanum"] = "1 - SQLite 3.0.0+ Compatible"
+            self._headertransdict["schemanum"] = "1 - SQLite 3.0.0+ Compatible"
         elif self.headerdict["schemanum"] == 2:
-            self.headertransdict["schemanum"] = "2 - SQLite 3.1.3+ Compatible"
+            self._headertransdict["schemanum"] = "2 - SQLite 3.1.3+ Compatible"
         elif self.headerdict["schemanum"] == 3:
-            self.headertransdict["schemanum"] = "3 - SQLite 3.1.4+ Compatible"
+            self._headertransdict["schemanum"] = "3 - SQLite 3.1.4+ Compatible"
         elif self.headerdict["schemanum"] == 4:
-            self.headertransdict["schemanum"] = "4 - SQLite 3.3.0+ Compatible"
+            self._headertransdict["schemanum"] = "4 - SQLite 3.3.0+ Compatible"
         else:
-            self.headertransdict["schemanum"] = "Invalid value: %s" % str(self.headerdict["schemanum"])
+            self._headertransdict["schemanum"] = "Invalid value: %s" % str(self.headerdict["schemanum"])
     # Suggested cache size
-        self.headertransdict["defpagecache"] = str(self.headerdict["defpagecache"])
+        self._headertransdict["defpagecache"] = str(self.headerdict["defpagecache"])
     # Largest Root Tree Page and Incremental Vacuum Settings
         if self.headerdict["bigroottree"] == 0:
-            self.headertransdict["bigroottree"] = "0 - ptrmap pages disabled"
+            self._headertransdict["bigroottree"] = "0 - ptrmap pages disabled"
             if self.headerdict["incvac"] == 0:
-                self.headertransdict["incvac"] = "0 - auto_vacuum mode"
+                self._headertransdict["incvac"] = "0 - auto_vacuum mode"
             else:
-                self.headertransdict["incvac"] = "Invalid mode: %s" % str(self.headerdict["incvac"])
+                self._headertransdict["incvac"] = "Invalid mode: %s" % str(self.headerdict["incvac"])
         else:
-            self.headertransdict["bigroottree"] = str(self.headerdict["bigroottree"])
-            self.headertransdict["incvac"] = "%s - incremental_vacuum mode" % str(self.headerdict["incvac"])
+            self._headertransdict["bigroottree"] = str(self.headerdict["bigroottree"])
+            self._headertransdict["incvac"] = "%s - incremental_vacuum mode" % str(self.headerdict["incvac"])
     # Text Encoding
         if self.headerdict["textencode"] == 1:
-            self.headertransdict["textencode"] = "UTF-8"
+            self._headertransdict["textencode"] = "UTF-8"
         elif self.headerdict["textencode"] == 2:
-            self.headertransdict["textencode"] = "UTF-16LE"
+            self._headertransdict["textencode"] = "UTF-16LE"
         elif self.headerdict["textencode"] == 3:
-            self.headertransdict["textencode"] = "UTF-16BE"
+            self._headertransdict["textencode"] = "UTF-16BE"
         else:
-            self.headertransdict["textencode"] = "Invalid Encoding: %s" % self.headerdict["textencode"]
+            self._headertransdict["textencode"] = "Invalid Encoding: %s" % self.headerdict["textencode"]
     # User Version
-        self.headertransdict["userver"] = str(self.headerdict["userver"])
+        self._headertransdict["userver"] = str(self.headerdict["userver"])
     # Expansion block
-        self.headertransdict["expansion"] = ":".join("{:02x}".format(ord(c)) for c in self.headerdict["expansion"])
+        self._headertransdict["expansion"] = ":".join("{:02x}".format(c) for c in self.headerdict["expansion"])
     # Version Valid For number
-        self.headertransdict["validfor"] = self.headerdict["validfor"]
+        self._headertransdict["validfor"] = self.headerdict["validfor"]
     # SQlite version number
-        self.headertransdict["sqlver"] = self.headerdict["sqlver"]
+        self._headertransdict["sqlver"] = self.headerdict["sqlver"]
+
+        return self._headertransdict
+
+#-------------------------------------------------------------------------------
+# Parallel scanning helpers - large files are split into regions which are
+# read through mmap windows by a pool of worker processes.
+#-------------------------------------------------------------------------------
+_mmapwindowsize = 64*1024*1024 # multiple of every valid page size and mmap granularity
+
+def _splitRegions(filesize, processes):
+    """
+    Split a file of the given size into one region per worker process. Regions
+    start on window boundaries so every region is mmap and page aligned.
+    Returns list of tuples in the form [(start,end),...].
+    """
+    windows = (filesize + _mmapwindowsize - 1) // _mmapwindowsize
+    regionsize = max(1, (windows + processes - 1) // processes) * _mmapwindowsize
+    return [(start, min(start+regionsize, filesize)) for start in range(0, filesize, regionsize)]
+
+def _mapRegions(worker, regionargs, processes, timeout=None):
+    """
+    Run the worker over each region's arguments, in a process pool if there is
+    more than one region. If a timeout (seconds) is given, a worker which has
+    not returned within it while its result is awaited is abandoned, the
+    failure logged, and None returned in its place; the pool is then
+    terminated rather than waiting on the hung worker.
+    Returns list of worker results in region order.
+    """
+    if len(regionargs) > 1:
+        pool = multiprocessing.Pool(min(processes, len(regionargs)))
+        timedout = False
+        try:
+            pending = [pool.apply_async(worker, (args,)) for args in regionargs]
+            results = list()
+            for args, result in zip(regionargs, pending):
+                try:
+                    results.append(result.get(timeout))
+                except multiprocessing.TimeoutError:
+                    logging.error("ERROR: Worker timed out on region %s-%s of %s" % (str(args[-3]),str(args[-2]),args[0]))
+                    results.append(None)
+                    timedout = True
+            return results
+        finally:
+            if timedout:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+    return [worker(args) for args in regionargs]
+
+#-------------------------------------------------------------------------------
+# Carving - locate databases and orphaned table leaf pages in raw images.
+#-------------------------------------------------------------------------------
+_carvesig = b"SQLite format 3\x00"
+
+def _isLeafTablePage(buf,offset,pagesize):
+    """
+    Sanity check a candidate B-tree Table Leaf page (flag 0x0D) held in buf at
+    offset. The page header, cell pointer array and freeblock pointer must all
+    fall inside the page.
+    Returns bool.
+    """
+    if offset+pagesize > len(buf):
+        return False
+    pagetype,freeblockofs,cellcount,contentareaofs,freebytefrags = struct.unpack_from(">BHHHB",buf,offset)
+    if (pagetype != 13) or (cellcount == 0) or (freebytefrags > 60):
+        return False
+    if contentareaofs == 0:
+        contentareaofs = 65536
+    cellptrendofs = 8+(2*cellcount)
+    if (contentareaofs < cellptrendofs) or (contentareaofs >= pagesize):
+        return False
+    if (freeblockofs != 0) and ((freeblockofs < cellptrendofs) or (freeblockofs > pagesize-4)):
+        return False
+    for cellptr in struct.unpack_from(">%sH" % str(cellcount),buf,offset+8):
+        if (cellptr < contentareaofs) or (cellptr >= pagesize):
+            return False
+    return True
+
+def _carveRegion(args):
+    """
+    Carve one region of an image. Used as the multiprocessing worker for
+    carveImage(). The region is read through mmap windows which overlap the
+    next window by one page, so signatures and pages starting near a window
+    edge are seen whole.
+    Pass a tuple of (image path, region start, region end, page size).
+    Returns tuple(list of header offsets, list of leaf table page offsets).
+    """
+    imagepath, regionstart, regionend, pagesize = args
+    headerlist = list()
+    leafpagelist = list()
+
+    imagefile = open(imagepath,"rb")
+    try:
+        filesize = os.path.getsize(imagepath)
+        winstart = regionstart
+        while winstart < regionend:
+            winend = min(winstart+_mmapwindowsize, regionend)
+            maplen = min(winend+pagesize, filesize) - winstart
+            window = mmap.mmap(imagefile.fileno(), maplen, access=mmap.ACCESS_READ, offset=winstart)
+            try:
+                # Database headers - only those starting inside this window.
+                searchend = min(winend-winstart+len(_carvesig)-1, maplen)
+                pos = window.find(_carvesig, 0, searchend)
+                while pos != -1:
+                    headerlist.append(winstart+pos)
+                    pos = window.find(_carvesig, pos+1, searchend)
+                # Page-aligned table leaf pages.
+                pageofs = 0
+                while pageofs < (winend-winstart):
+                    if (window[pageofs] == 13) and _isLeafTablePage(window,pageofs,pagesize):
+                        leafpagelist.append(winstart+pageofs)
+                    pageofs+=pagesize
+            finally:
+                window.close()
+            winstart = winend
+    finally:
+        imagefile.close()
+
+    return headerlist, leafpagelist
+
+def carveImage(imagepath, pagesize=4096, processes=None, timeout=None):
+    """
+    Carve SQLite databases and orphaned table leaf pages from a raw disk image
+    or unallocated cluster dump of any size. The image is split into regions
+    which are scanned in parallel by a pool of worker processes.
+    Leaf pages are searched for at offsets aligned to the given page size.
+    Regions whose worker exceeds the timeout (seconds) are skipped.
+    Returns tuple(list of carved database dicts in the form
+    [{'offset':int,'dbend':int},...], list of orphaned leaf table page offsets
+    not inside any carved database).
+    """
+    filesize = os.path.getsize(imagepath)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    regions = [(imagepath, start, end, pagesize) for start, end in _splitRegions(filesize, processes)]
+    results = _mapRegions(_carveRegion, regions, processes, timeout)
 
-        return self.headertransdict
+    headerlist = list()
+    leafpagelist = list()
+    for result in results:
+        if result is None:
+            continue # Timed out - logged by _mapRegions.
+        headers, leafpages = result
+        headerlist.extend(headers)
+        leafpagelist.extend(leafpages)
 
+    # Bound each carved database by its in-header page count, or by the next
+    # carved header if the count is not usable.
+    carvedlist = list()
+    imagefile = open(imagepath,"rb")
+    try:
+        for i, offset in enumerate(headerlist):
+            imagefile.seek(offset+16)
+            rawheader = imagefile.read(16)
+            if len(rawheader) < 16:
+                continue
+            dbpagesize = struct.unpack(">H",rawheader[0:2])[0]
+            if dbpagesize == 1:
+                dbpagesize = 65536
+            if (dbpagesize < 512) or (dbpagesize & (dbpagesize-1)):
+                continue # Not a genuine header, e.g. the signature inside a text field.
+            dbsize = struct.unpack(">I",rawheader[12:16])[0]
+            if i+1 < len(headerlist):
+                nextoffset = headerlist[i+1]
+            else:
+                nextoffset = filesize
+            if dbsize > 0:
+                dbend = min(offset + dbsize*dbpagesize, filesize)
+            else:
+                dbend = nextoffset
+            carvedlist.append({'offset':offset,'dbend':dbend})
+    finally:
+        imagefile.close()
 
+    # Merge the carved extents so each orphan candidate needs a single bisect.
+    extentstarts = list()
+    extentends = list()
+    for carved in carvedlist:
+        if extentends and carved['offset'] <= extentends[-1]:
+            extentends[-1] = max(extentends[-1], carved['dbend'])
+        else:
+            extentstarts.append(carved['offset'])
+            extentends.append(carved['dbend'])
+    orphanlist = list()
+    for page in leafpagelist:
+        i = bisect.bisect_right(extentstarts, page) - 1
+        if (i < 0) or (page >= extentends[i]):
+            orphanlist.append(page)
 
+    return carvedlist, orphanlist
 
+#-------------------------------------------------------------------------------
+# Diffing - locate the pages that differ between two snapshots of a database.
+#-------------------------------------------------------------------------------
+def _diffRegion(args):
+    """
+    Compare one region of two files page by page. Used as the multiprocessing
+    worker for diffPages(). Each mmap window is compared whole first so
+    unchanged windows cost a single comparison.
+    Pass a tuple of (first path, second path, region start, region end, page
+    size); the region must lie within both files.
+    Returns list of absolute offsets of the pages that differ.
+    """
+    patha, pathb, regionstart, regionend, pagesize = args
+    changedlist = list()
 
+    filea = open(patha,"rb")
+    fileb = open(pathb,"rb")
+    try:
+        winstart = regionstart
+        while winstart < regionend:
+            maplen = min(winstart+_mmapwindowsize, regionend) - winstart
+            windowa = mmap.mmap(filea.fileno(), maplen, access=mmap.ACCESS_READ, offset=winstart)
+            windowb = mmap.mmap(fileb.fileno(), maplen, access=mmap.ACCESS_READ, offset=winstart)
+            try:
+                if windowa[:] != windowb[:]:
+                    for pageofs in range(0, maplen, pagesize):
+                        if windowa[pageofs:pageofs+pagesize] != windowb[pageofs:pageofs+pagesize]:
+                            changedlist.append(winstart+pageofs)
+            finally:
+                windowa.close()
+                windowb.close()
+            winstart+=maplen
+    finally:
+        filea.close()
+        fileb.close()
 
+    return changedlist
 
+def diffPages(patha, pathb, pagesize, processes=None, timeout=None):
+    """
+    Compare two files page by page, in parallel across page ranges. Pages
+    present in only the longer of the two files are reported as changed, as
+    are all pages of a region whose worker exceeds the timeout (seconds).
+    Returns a sorted list of absolute offsets of the pages that differ.
+    """
+    sizea = os.path.getsize(patha)
+    sizeb = os.path.getsize(pathb)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
 
+    commonsize = min(sizea, sizeb)
+    regions = [(patha, pathb, start, end, pagesize) for start, end in _splitRegions(commonsize, processes)]
+    changedlist = list()
+    for region, changed in zip(regions, _mapRegions(_diffRegion, regions, processes, timeout)):
+        if changed is None:
+            # Timed out - every page in the region has to be treated as changed.
+            changed = range(region[2], region[3], pagesize)
+        changedlist.extend(changed)
+    # Tail beyond the shorter file, starting at the page containing its end.
+    changedlist.extend(range(commonsize - commonsize%pagesize, max(sizea, sizeb), pagesize))
+    return sorted(set(changedlist))
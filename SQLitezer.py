@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 #-------------------------------------------------------------------------------
 # Name:        SQLitezer - Forensic SQLite Database Analyser and Reporting Tool
 # Purpose:     Produces a csv-formatted report of each element in a database and
@@ -18,7 +18,10 @@ import sqlite3
 import logging
 import csv
 import struct
+import threading
+import json
 
+import NotionalIndex
 import NotionalSQLite
 
 version = '0.6.2'
@@ -46,26 +49,312 @@ headerfields = (("Signature","sig"),
                 ("Valid-For Version","validfor"),
                 ("Last SQLite Version","sqlver"))
 
+def openCSV(path, mode="w"):
+    """
+    Open a CSV report file. Values recovered as raw bytes (see csvRow) are
+    written back out byte for byte.
+    """
+    return open(path, mode, newline="", encoding="utf-8", errors="surrogateescape")
+
+def csvRow(row):
+    """
+    Prepare a row of recovered values for a CSV writer - byte strings (BLOB
+    fields, unallocated data) are passed through undecoded. NULs, which would
+    make the reports unusable with grep, are the exception: a BLOB containing
+    one is written as hex in SQLite's X'...' literal form and a NUL in a TEXT
+    field is escaped as \\x00.
+    """
+    return [csvValue(value) for value in row]
+
+def csvValue(value):
+    """
+    Escape one recovered value for a CSV writer (see csvRow).
+    """
+    if isinstance(value, bytes):
+        if b"\x00" in value:
+            return "X'%s'" % value.hex().upper()
+        return value.decode("utf-8","surrogateescape")
+    if isinstance(value, str):
+        return value.replace("\x00","\\x00")
+    return value
+
+def headerValue(value):
+    """
+    Return a raw database header field for the report - byte string fields
+    (the signature and expansion block) have their NULs stripped.
+    """
+    if isinstance(value, bytes):
+        return value.replace(b"\x00",b"").decode("utf-8","surrogateescape")
+    return value
+
+class ProgressReporter(object):
+    """
+    Reports export progress from a background sampling thread. The decode loop
+    only increments the pages and cells counters; throughput (pages/sec,
+    MB/sec, cells/sec) and the ETA are derived by the thread every interval
+    seconds, printed to the console and optionally written as JSON lines to a
+    machine-readable progress file.
+    When resuming, pass the pages and cells already done as startpages and
+    startcells - the counters start from them, but the rates and ETA only
+    count the work done since this run started.
+    """
+    def __init__(self, stage, totalpages, pagesize, progressfile=None, interval=5, startpages=0, startcells=0):
+        self.stage = stage
+        self.totalpages = totalpages
+        self.pagesize = 65536 if pagesize == 1 else pagesize
+        self.progressfile = progressfile
+        self.interval = interval
+        self.startpages = startpages
+        self.startcells = startcells
+        self.pages = startpages
+        self.cells = startcells
+        self._stopevent = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self.starttime = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop sampling and report the final totals.
+        """
+        self._stopevent.set()
+        self._thread.join()
+        self._report()
+
+    def _run(self):
+        while not self._stopevent.wait(self.interval):
+            self._report()
+
+    def _report(self):
+        pages = self.pages
+        cells = self.cells
+        elapsed = max(time.time() - self.starttime, 0.001)
+        pagerate = (pages - self.startpages) / elapsed
+        cellrate = (cells - self.startcells) / elapsed
+        if self.totalpages > 0:
+            percent = 100.0 * pages / self.totalpages
+        else:
+            percent = 100.0
+        # The ETA is unknown (None) until a page has been done in this run.
+        if pages >= self.totalpages:
+            eta = 0
+        elif pagerate > 0:
+            eta = int((self.totalpages - pages) / pagerate)
+        else:
+            eta = None
+        print("  %5.1f%% | %s/%s pages | %.1f pages/s | %.2f MB/s | %.1f cells/s | ETA %s" % (percent, str(pages), str(self.totalpages), pagerate,
+            pagerate * self.pagesize / 1048576.0, cellrate, str(datetime.timedelta(seconds=eta)) if eta is not None else "unknown"))
+        if self.progressfile is not None:
+            self.progressfile.write(json.dumps({"time":time.time(),"stage":self.stage,"pages":pages,"totalpages":self.totalpages,
+                                                "cells":cells,"percent":round(percent,2),"pagespersec":round(pagerate,2),
+                                                "mbpersec":round(pagerate * self.pagesize / 1048576.0,3),
+                                                "cellspersec":round(cellrate,2),"etasec":eta}) + "\n")
+            self.progressfile.flush()
+
+class ExportCheckpoint(object):
+    """
+    Records how far the -a/-u exports have got so an interrupted run can be
+    resumed. For each export stage it saves the number of pages fully written
+    and the output file position after them. It also saves the search index
+    row count, the error report size and the flags in use. The checkpoint is
+    saved at most every interval seconds, always after a whole page, and when
+    a stage completes.
+    """
+    def __init__(self, outfile, infile, flags, interval=30):
+        self.path = outfile+".checkpoint"
+        self.outfile = outfile
+        self.interval = interval
+        self.state = {"input":os.path.abspath(infile),"flags":flags,"stages":{},"indexrows":0,"errorsize":None}
+        self.files = dict()
+        self.index = None
+        self.resumed = False
+        self._lastsave = time.time()
+
+    def load(self):
+        """
+        Load the saved checkpoint for this output job. It must have been made
+        for the same input file and flags.
+        Returns bool.
+        """
+        if not os.path.isfile(self.path):
+            return False
+        with open(self.path) as checkpointfile:
+            saved = json.load(checkpointfile)
+        if (saved["input"] != self.state["input"]) or (saved["flags"] != self.state["flags"]):
+            return False
+        self.state = saved
+        self.resumed = True
+        return True
+
+    def openOutput(self, stage, path):
+        """
+        Open a stage's output file - truncated back to the checkpointed position
+        when resuming, otherwise created empty.
+        Returns the file object.
+        """
+        if self.resumed and stage in self.state["stages"]:
+            outputfile = openCSV(path,"r+")
+            outputfile.seek(self.state["stages"][stage]["filepos"])
+            outputfile.truncate()
+        else:
+            outputfile = openCSV(path)
+        self.files[stage] = outputfile
+        return outputfile
+
+    def getStage(self, stage):
+        """
+        Returns the checkpointed progress of a stage as a dict of pagesdone,
+        cells, filepos and complete.
+        """
+        return self.state["stages"].get(stage,{"pagesdone":0,"cells":0,"filepos":0,"complete":False})
+
+    def update(self, stage, pagesdone, cells, header, complete=False):
+        """
+        Called after each page is fully written; saves the checkpoint if the
+        interval has passed or the stage is complete.
+        """
+        if complete or (time.time() - self._lastsave >= self.interval):
+            self.save(stage, pagesdone, cells, header, complete)
+
+    def save(self, stage=None, pagesdone=0, cells=0, header=None, complete=False):
+        """
+        Flush the outputs and write the checkpoint. Stages without recorded
+        progress are recorded at their current (starting) file position.
+        """
+        for name, outputfile in self.files.items():
+            outputfile.flush()
+            if (name == stage) or (name not in self.state["stages"]):
+                self.state["stages"][name] = {"pagesdone":pagesdone if name == stage else 0,
+                                              "cells":cells if name == stage else 0,
+                                              "filepos":outputfile.tell(),
+                                              "complete":complete if name == stage else False}
+        if self.index is not None:
+            self.state["indexrows"] = self.index.checkpoint()
+        if (header is not None) and header.hardened:
+            writePageErrors(header,self.outfile)
+        if os.path.isfile(self.outfile+"_errors.csv"):
+            self.state["errorsize"] = os.path.getsize(self.outfile+"_errors.csv")
+        # Write then rename, so an interruption never leaves a partial checkpoint.
+        with open(self.path+".tmp","w") as checkpointfile:
+            json.dump(self.state, checkpointfile)
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        os.rename(self.path+".tmp", self.path)
+        self._lastsave = time.time()
+
+    def finish(self):
+        """
+        Remove the checkpoint once the run has completed.
+        """
+        for outputfile in self.files.values():
+            outputfile.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
 def main():
     startTime = datetime.datetime.now()
     startTimeStr = str(startTime)[:19].replace(":","-").replace(" ","_")
 
-    outfile, infile, pagemap, debug, active, content, unalloc = validateArgs()
+    outfile, infile, pagemap, debug, active, content, unalloc, triage, carve, carvepagesize, difffile, buildindex, keyword, regex, hardened, timeout, progresspath, resume, orphanencoding = validateArgs()
     setupLogging(outfile)
 
-    print "\n[CONFIGURATION]"
+    print("\n[CONFIGURATION]")
     logging.info(" Target Database: " + os.path.abspath(infile))
     logging.info(" Report File: " + os.path.abspath(outfile))
 
-    print "\n <SETTING UP REPORT FILE(S)...>"
-    outcsv = csv.writer(open(outfile+".csv","wb"))
+    if triage: # if 't' switch is used - no other reports are generated.
+        triageFiles(infile, outfile, debug)
+        print("")
+        logging.info("[REPORTING COMPLETED]")
+        print("")
+        logging.info("SQLiteZer took " + str(datetime.datetime.now()-startTime) + " to run.")
+        return
+
+    if keyword or regex: # if 'q' or 'r' switch is used - answered from the index only.
+        searchIndex(outfile, keyword, regex)
+        print("")
+        logging.info("[REPORTING COMPLETED]")
+        print("")
+        logging.info("SQLiteZer took " + str(datetime.datetime.now()-startTime) + " to run.")
+        return
+
+    print("\n <SETTING UP REPORT FILE(S)...>")
+    checkpoint = None
+    if (active or unalloc) and not carve:
+        checkpoint = ExportCheckpoint(outfile, infile, {"active":active,"unalloc":unalloc,"index":buildindex,"hardened":hardened})
+        if resume:
+            if not checkpoint.load():
+                logging.error("ERROR: No checkpoint for this output name with the same input and -a/-u/-s/-z switches - cannot resume.")
+                sys.exit(1)
+            logging.info(" Resuming from checkpoint: %s" % os.path.abspath(checkpoint.path))
+    elif resume:
+        logging.error("ERROR: Only the -a/-u exports of a database can be resumed.")
+        sys.exit(1)
+
+    outcsv = csv.writer(openCSV(outfile+".csv"))
+    index = None
+    if buildindex:
+        if not (active or unalloc):
+            logging.info("WARNING: The search index is built from the -a/-u exports - nothing will be indexed.")
+        if resume:
+            index = NotionalIndex.NotionalIndex(outfile+"_index.db")
+            index.truncate(checkpoint.state["indexrows"])
+        else:
+            index = NotionalIndex.NotionalIndex(outfile+"_index.db",True)
     if active:
-        outactivecsv = csv.writer(open(outfile+"_active.csv","wb"))
+        if checkpoint is not None:
+            outactivecsv = csv.writer(checkpoint.openOutput("active",outfile+"_active.csv"))
+        else:
+            outactivecsv = csv.writer(openCSV(outfile+"_active.csv"))
     if unalloc:
-        outunalloctsv = csv.writer(open(outfile+"_unalloc.csv","wb"), delimiter='\t',quotechar='"')
+        if checkpoint is not None:
+            outunalloctsv = csv.writer(checkpoint.openOutput("unalloc",outfile+"_unalloc.csv"), delimiter='\t',quotechar='"')
+        else:
+            outunalloctsv = csv.writer(openCSV(outfile+"_unalloc.csv"), delimiter='\t',quotechar='"')
+        if not resume:
+            outunalloctsv.writerow(["Offset","Unallocated Type","Block Length","Printable Data"])
+    progressfile = None
+    if progresspath:
+        progressfile = open(progresspath,"a")
+    if hardened:
+        if resume and checkpoint.state["errorsize"] is not None:
+            outerrors = openCSV(outfile+"_errors.csv","r+")
+            outerrors.seek(checkpoint.state["errorsize"])
+            outerrors.truncate()
+        else:
+            outerrors = openCSV(outfile+"_errors.csv")
+            csv.writer(outerrors).writerow(["Page Offset","Stage","Reason"])
+        outerrors.close()
+    if checkpoint is not None:
+        checkpoint.index = index
+        if not resume:
+            checkpoint.save()
 
-    print "\n[DATABASE HEADER]"
-    header = NotionalSQLite.NotionalSQLite(infile,debug)
+    if carve: # if 'k' switch is used - the input is a raw image, not a database.
+        try:
+            carveImage(infile, outcsv, carvepagesize, debug,
+                       outactivecsv if active else None,
+                       outunalloctsv if unalloc else None,
+                       index, hardened, timeout, outfile, progressfile, orphanencoding, content)
+        except NotionalSQLite.PageParseError as e:
+            pageParseFailed(e)
+        if index is not None:
+            index.close()
+        print("")
+        logging.info("[REPORTING COMPLETED]")
+        print("")
+        logging.info("SQLiteZer took " + str(datetime.datetime.now()-startTime) + " to run.")
+        return
+
+    print("\n[DATABASE HEADER]")
+    header = NotionalSQLite.NotionalSQLite(infile,debug,hardened=hardened)
+    if header.statuscode == 2:
+        logging.error("ERROR: Cannot continue - exiting.")
+        sys.exit(1)
     if header.statuscode == 1:
         logging.error("ERROR: Could not create NotionalSQL object - check that the target database is closed and unlocked.")
         logging.error("ERROR: Cannot continue - exiting.")
@@ -74,34 +363,54 @@ def main():
         logging.info(" Signature check: Valid")
     else:
         logging.info(" Signature check: Invalid")
-        logging.error("ERROR: Database is corrupt or encrypted - Signature: %s" % header.headerdict["sig"])
+        logging.error("ERROR: Database is corrupt or encrypted - Signature: %s" % header.headerdict["sig"].replace(b"\x00",b"").decode("utf-8","replace"))
         logging.error("ERROR: Cannot continue - exiting.")
         sys.exit(1)
 
-    transheaderdict = header.translateHeader()
+    transheaderdict = header.headertransdict
 
     outcsv.writerow(["{HEADER}"])
     outcsv.writerow(["Field Name","Raw Value","Translated Value"])
     for value in headerfields:
-        print " %s: %s" % (value[0],transheaderdict[value[1]])
-        outcsv.writerow((value[0],header.headerdict[value[1]],transheaderdict[value[1]]))
+        print(" %s: %s" % (value[0],transheaderdict[value[1]]))
+        outcsv.writerow([value[0],headerValue(header.headerdict[value[1]]),transheaderdict[value[1]]])
 
-    pagetypedict = header.getPageTypeDict(header.headerdict['pagesize'])
-
-    if pagemap: # if 'm' switch is used.
-        mapPages(header, outcsv)
-    if content: # if 'c' switch is used.
-        contentanalysis(infile, outcsv)
-    if active: # if 'a' switch is used.
-        dumpActiveRows(header,outactivecsv,pagetypedict)
-    if unalloc: # if 'u' switch is used.
-        dumpUnallocated(header,outunalloctsv,pagetypedict)
+    # The page survey is only performed (once) by the header object if one of
+    # the dump switches needs it.
+    try:
+        if pagemap: # if 'm' switch is used.
+            mapPages(header, outcsv)
+        if content: # if 'c' switch is used.
+            contentanalysis(header, infile, outcsv)
+        if active: # if 'a' switch is used.
+            dumpActiveRows(header,outactivecsv,header.pagetypedict,index=index,progressfile=progressfile,checkpoint=checkpoint)
+        if unalloc: # if 'u' switch is used.
+            dumpUnallocated(header,outunalloctsv,header.pagetypedict,index=index,progressfile=progressfile,checkpoint=checkpoint)
+        if index is not None: # if 's' switch is used.
+            index.close()
+            logging.info("Search index complete; %s term hits indexed." % str(index.hitcount))
+        if checkpoint is not None:
+            checkpoint.finish()
+        if difffile: # if 'd' switch is used.
+            diffSnapshots(header,difffile,outfile,debug,timeout)
+    except NotionalSQLite.PageParseError as e:
+        pageParseFailed(e)
+    if hardened: # if 'z' switch is used.
+        writePageErrors(header,outfile)
 
-    print ""
+    print("")
     logging.info("[REPORTING COMPLETED]")
-    print ""
+    print("")
     logging.info("SQLiteZer took " + str(datetime.datetime.now()-startTime) + " to run.")
 
+def pageParseFailed(error):
+    """
+    Report a page which failed to parse without the 'z' switch, and exit.
+    """
+    logging.error("ERROR: Could not parse the page at offset %s - the database may be corrupt. Use -z to record such pages and carry on.\nError: %s" % (str(error.offset),error))
+    logging.error("ERROR: Cannot continue - exiting.")
+    sys.exit(1)
+
 def getRowCount(tablename,dbcurs):
     """
     Return the number of rows in the table.
@@ -109,21 +418,24 @@ def getRowCount(tablename,dbcurs):
     try:
         sqlquery = "SELECT count(*) FROM %s" % (tablename)
         dbcurs.execute(sqlquery)
+        rowcount = dbcurs.fetchall()
     except sqlite3.OperationalError as e:
         logging.error('ERROR: The SQLite3 module encountered an error querying the table "%s" - check that you replaced the sqlite3.dll with the latest Amalgamation DLL from http://www.sqlite.org/download.html\nError: %s' % (tablename,e))
         return 'ERROR'
-    rowcount = dbcurs.fetchall()
+    except sqlite3.DatabaseError as e:
+        logging.error('ERROR: The SQLite3 module could not query the table "%s" - the database may be corrupt or truncated.\nError: %s' % (tablename,e))
+        return 'ERROR'
     return rowcount[0][0]
 
-def getElements(dbcurs):
+def getElements(header):
     """
-    Return a Dict of all elements in DB.
+    Return a Dict of all elements in DB, using the header object's cached
+    sqlite_master schema.
     """
     try:
-        dbcurs.execute("SELECT * FROM sqlite_master")
-        elementresults = dbcurs.fetchall()
-    except sqlite3.OperationalError as e:
-        logging.error('ERROR: The SQLite3 module encountered an error querying the master table - check that the database is not locked or in-use. The application cannot continue.\nError: %s' % e)
+        elementresults = header.schema
+    except NotionalSQLite.PageParseError as e:
+        logging.error('ERROR: Could not parse the master table from page 1 - the database may be corrupt. The application cannot continue.\nError: %s' % e)
         sys.exit(1)
 
     elementdict = dict({"tables":list(),"indexes":list(),"triggers":list(),"views":list()})
@@ -170,22 +482,30 @@ def getElements(dbcurs):
 
     return elementcount, elementdict
 
-def contentanalysis(infile,outcsv):
+def contentanalysis(header,infile,outcsv):
     """
     Triggered if the 'c' switch is supplied.
     Enumerates the tables, indexes, triggers, etc... and enumerates the rows in each.
+    Pass infile as None for a database embedded in a larger file (carved) -
+    views and virtual tables cannot then be counted and are reported as N/A.
     """
-    print "\n[CONTENT ANALYSIS]"
-    print "\n <CONNECTING TO DB...>"
-    try:
-        dbconn = sqlite3.connect(infile)
-        dbcurs = dbconn.cursor()
-    except:
-        logging.error("Could not connect to SQLite DB - Exiting...")
-        sys.exit(1)
+    print("\n[CONTENT ANALYSIS]")
+    print(" <GENERATING TABLE CONTENT REPORT>\n")
+    elementCount, elementDict = getElements(header)
 
-    print " <GENERATING TABLE CONTENT REPORT>\n"
-    elementCount, elementDict = getElements(dbcurs)
+    # Table row counts come from the B-trees; only views and virtual tables
+    # (no rootpage) need the SQLite3 module to be counted.
+    dbcurs = None
+    if infile is None:
+        pass
+    elif (len(elementDict["views"]) > 0) or (0 in [table[2] for table in elementDict["tables"]]):
+        print(" <CONNECTING TO DB...>")
+        try:
+            dbconn = sqlite3.connect(infile)
+            dbcurs = dbconn.cursor()
+        except:
+            logging.error("Could not connect to SQLite DB - Exiting...")
+            sys.exit(1)
 
     logging.info("Total elements identified in database: %s" % str(elementCount))
     logging.info(" - # of Tables: %s" % str(len(elementDict["tables"])))
@@ -198,21 +518,30 @@ def contentanalysis(infile,outcsv):
     # TABLES - Collect, Print, and Export.
         if len(elementDict["tables"]) > 0:
             for tablename in elementDict["tables"]:
-                rowcount = getRowCount(tablename[0],dbcurs)
+                if tablename[2]:
+                    try:
+                        rowcount = header.getRowCount(tablename[2])
+                    except NotionalSQLite.PageParseError as e:
+                        logging.error('ERROR: Could not count the rows of table "%s".\nError: %s' % (tablename[0],e))
+                        rowcount = 'ERROR'
+                elif dbcurs is None:
+                    rowcount = 'N/A'
+                else:
+                    rowcount = getRowCount(tablename[0],dbcurs)
                 rowdata.append([rowcount,0])
 
             row_format = "{:^4} {:<%s} {:<12}" % str(elementDict["maxtablenamelen"] + 1)
             column_header = ['#','Table Name', 'Row Count']
             column_divider = ['-','----------','---------']
 
-            print "\n{TABLES}\n"
-            print row_format.format(*column_header)
-            print row_format.format(*column_divider)
+            print("\n{TABLES}\n")
+            print(row_format.format(*column_header))
+            print(row_format.format(*column_divider))
             outcsv.writerow(["{TABLES}"])
             outcsv.writerow(["#","Table Name","Row Count","Rootpage","SQL Statement"])
 
             for table, row in zip(elementDict["tables"], rowdata):
-                print row_format.format(elementDict["tables"].index(table)+1, table[0], *row)
+                print(row_format.format(elementDict["tables"].index(table)+1, table[0], *row))
                 outcsv.writerow([elementDict["tables"].index(table)+1, table[0],row[0],table[2],table[3].replace(os.linesep,"")])
 
     # INDEXES - Collect, Print, and Export.
@@ -221,16 +550,16 @@ def contentanalysis(infile,outcsv):
             column_header = ['#','Index Name', 'Associated Table']
             column_divider = ['-','----------','----------------']
 
-            print "\n{INDEXES}\n"
-            print row_format.format(*column_header)
-            print row_format.format(*column_divider)
+            print("\n{INDEXES}\n")
+            print(row_format.format(*column_header))
+            print(row_format.format(*column_divider))
             outcsv.writerow(["{INDEXES}"])
             outcsv.writerow(["#","Index Name","Associated Table Name","Rootpage","SQL Statement"])
 
             for index in elementDict["indexes"]:
                 if index[3] is None:
                     index[3] = "<EMPTY>"
-                print row_format.format(elementDict["indexes"].index(index)+1, index[0], index[1])
+                print(row_format.format(elementDict["indexes"].index(index)+1, index[0], index[1]))
                 outcsv.writerow([elementDict["indexes"].index(index)+1,index[0],index[1],index[2],index[3].replace(os.linesep,"")])
 
     # TRIGGERS - Collect, Print, and Export.
@@ -239,81 +568,387 @@ def contentanalysis(infile,outcsv):
             column_header = ['#','Triggering Type', 'Associated Table']
             column_divider = ['-','---------------','----------------']
 
-            print "\n{TRIGGERS}\n"
-            print row_format.format(*column_header)
-            print row_format.format(*column_divider)
+            print("\n{TRIGGERS}\n")
+            print(row_format.format(*column_header))
+            print(row_format.format(*column_divider))
             outcsv.writerow(["{TRIGGERS}"])
             outcsv.writerow(["#","Triggering Type","Associated Table Name","Rootpage","SQL Statement"])
 
             for trigger in elementDict["triggers"]:
-                print row_format.format(elementDict["triggers"].index(trigger)+1, trigger[0], trigger[1])
+                print(row_format.format(elementDict["triggers"].index(trigger)+1, trigger[0], trigger[1]))
                 outcsv.writerow([elementDict["triggers"].index(trigger)+1,trigger[0],trigger[1],trigger[2],trigger[3].replace(os.linesep,"")])
 
     # VIEWS - Collect, Print, and Export.
         if len(elementDict["views"]) > 0:
+            rowdata = list()
             for viewname in elementDict["views"]:
-                rowcount = getRowCount(viewname[0],dbcurs)
+                if dbcurs is None:
+                    rowcount = 'N/A'
+                else:
+                    rowcount = getRowCount(viewname[0],dbcurs)
                 rowdata.append([rowcount,0])
 
             row_format = "{:^4} {:<%s} {:<12}" % str(elementDict["maxviewnamelen"] + 1)
             column_header = ['#','View Name', 'Row Count']
             column_divider = ['-','----------','---------']
 
-            print "\n{VIEWS}\n"
-            print row_format.format(*column_header)
-            print row_format.format(*column_divider)
+            print("\n{VIEWS}\n")
+            print(row_format.format(*column_header))
+            print(row_format.format(*column_divider))
             outcsv.writerow(["{VIEWS}"])
             outcsv.writerow(["#","View Name","Row Count","Rootpage","SQL Statement"])
 
             for view, row in zip(elementDict["views"], rowdata):
-                print row_format.format(elementDict["views"].index(view)+1, view[0], *row)
+                print(row_format.format(elementDict["views"].index(view)+1, view[0], *row))
                 outcsv.writerow([elementDict["views"].index(view)+1, view[0],row[0],view[2],view[3].replace(os.linesep,"")])
     else:
         logging.info("WARNING: Database does not contain any elements.")
 
-def dumpActiveRows(header,outactivecsv,pagetypedict):
+def dumpActiveRows(header,outactivecsv,pagetypedict,pagesize=None,usetables=True,index=None,progressfile=None,checkpoint=None):
     """
     Triggered if the 'a' switch is supplied.
     Export all active row content into CSV format. Useful for grep, manual review, etc...
-    The first value of each line is the Page Offset.
-    """
-    i=0
-    print "\n[DUMP ACTIVE CONTENT]"
-    print " <PARSING LEAF TABLE PAGES FOR ACTIVE CELL CONTENT>\n"
-    for page in pagetypedict['leaftable']:
-        for row in header.getActiveRowContent(page,header.headerdict['pagesize']):
-            row.insert(0,page)
-            outactivecsv.writerow(row)
-            i+=1
-            if((i%5000)==0):
-                print "  %s cells exported..." % str(i)
-    logging.info("Active cell export complete; %s cells exported." % str(i))
-
-def dumpUnallocated(header,outunalloctsv,pagetypedict):
+    Rows are grouped by table with named, typed columns where the schema can be
+    read (and usetables is set); leaf pages not reachable from any table are
+    exported generically. Each cell is also added to the search index, if given.
+    Progress is reported against the page total (and written to progressfile).
+    If a checkpoint is given, pages already exported by an interrupted run are
+    skipped and progress is checkpointed after each page.
+    The first two values of each line are the Page Offset and the Rowid.
+    """
+    if pagesize is None:
+        pagesize = header.getPageSize()
+    tables = list()
+    if usetables:
+        try:
+            tables = header.tables
+        except NotionalSQLite.PageParseError as e:
+            logging.error('ERROR: Could not read the schema - all rows will be exported without column names.\nError: %s' % e)
+
+    # Each section: (table name, column header row, leaf pages, decoder)
+    sections = list()
+    assignedpages = set()
+    for table in tables:
+        sections.append((table['name'],["Page Offset","Rowid"] + [column[0] for column in table['columns']],table['leafpages'],table['decoder']))
+        assignedpages.update(table['leafpages'])
+    unassignedpages = [page for page in pagetypedict['leaftable'] if page not in assignedpages]
+    if len(unassignedpages) > 0:
+        sections.append((None,["Page Offset","Rowid","Values"],unassignedpages,None))
+
+    stage = checkpoint.getStage("active") if checkpoint is not None else {"pagesdone":0,"cells":0,"complete":False}
+    print("\n[DUMP ACTIVE CONTENT]")
+    if stage["complete"]:
+        logging.info("Active cell export already complete (resumed); %s cells exported." % str(stage["cells"]))
+        return
+    print(" <PARSING LEAF TABLE PAGES FOR ACTIVE CELL CONTENT>\n")
+    progress = ProgressReporter("Active Cells",sum([len(section[2]) for section in sections]),pagesize,progressfile,
+                                startpages=stage["pagesdone"],startcells=stage["cells"])
+    progress.start()
+    pageindex = 0
+    for tablename, columnheader, pagelist, decoder in sections:
+        if pageindex >= stage["pagesdone"]: # section not started before the checkpoint
+            outactivecsv.writerow(["{TABLE: %s}" % tablename if tablename is not None else "{UNKNOWN TABLE}"])
+            outactivecsv.writerow(columnheader)
+        for page in pagelist:
+            pageindex+=1
+            if pageindex <= stage["pagesdone"]:
+                continue
+            progress.pages+=1
+            try:
+                cells = header.getActiveCellContent(page,pagesize,decoder)
+            except NotionalSQLite.PageParseError as e:
+                header.recordPageError(e,"Active Cells")
+                continue
+            for cell, row in cells:
+                if index is not None:
+                    index.addContent(page,cell,"Active Cell",row[1:],tablename)
+                row.insert(0,page)
+                outactivecsv.writerow(csvRow(row))
+                progress.cells+=1
+            if checkpoint is not None:
+                checkpoint.update("active",pageindex,progress.cells,header)
+    progress.stop()
+    if checkpoint is not None:
+        checkpoint.update("active",pageindex,progress.cells,header,True)
+    logging.info("Active cell export complete; %s cells exported." % str(progress.cells))
+
+def dumpUnallocated(header,outunalloctsv,pagetypedict,pagesize=None,index=None,progressfile=None,checkpoint=None):
     """
     Triggered if the 'u' switch is supplied.
-    Export all unallocated data to a tab-delimited file.
-    """
-    i=0
-    print "\n[DUMP UNALLOCATED CONTENT]"
-    outunalloctsv.writerow(["Offset","Unallocated Type","Block Length","Printable Data"])
-    print " <PARSING LEAF TABLE PAGES FOR UNALLOCATED CONTENT>\n"
-    for page in pagetypedict['leaftable']:
-        unalloclist = header.getUnallocContent(page,header.headerdict['pagesize'])
+    Export all unallocated data to a tab-delimited file. Each block is also
+    added to the search index, if given. Progress is reported against the page
+    total (and written to progressfile). If a checkpoint is given, pages already
+    exported by an interrupted run are skipped and progress is checkpointed
+    after each page.
+    """
+    if pagesize is None:
+        pagesize = header.getPageSize()
+    stage = checkpoint.getStage("unalloc") if checkpoint is not None else {"pagesdone":0,"cells":0,"complete":False}
+    print("\n[DUMP UNALLOCATED CONTENT]")
+    if stage["complete"]:
+        logging.info("Unallocated block export already complete (resumed); %s blocks exported." % str(stage["cells"]))
+        return
+    print(" <PARSING LEAF TABLE PAGES FOR UNALLOCATED CONTENT>\n")
+    progress = ProgressReporter("Unallocated",len(pagetypedict['leaftable']),pagesize,progressfile,
+                                startpages=stage["pagesdone"],startcells=stage["cells"])
+    progress.start()
+    for pageindex, page in enumerate(pagetypedict['leaftable'][stage["pagesdone"]:], stage["pagesdone"]+1):
+        progress.pages+=1
+        try:
+            unalloclist = header.getUnallocContent(page,pagesize)
+        except NotionalSQLite.PageParseError as e:
+            header.recordPageError(e,"Unallocated")
+            continue
         for row in unalloclist:
-            outunalloctsv.writerow(row)
-            i+=1
-            if((i%5000)==0):
-                print "  %s unallocated blocks exported..." % str(i)
-    logging.info("Unallocated block export complete; %s blocks exported." % str(i))
+            if index is not None:
+                index.addContent(page,row[0],row[1],[row[3]])
+            outunalloctsv.writerow(csvRow(row))
+            progress.cells+=1
+        if checkpoint is not None:
+            checkpoint.update("unalloc",pageindex,progress.cells,header)
+    progress.stop()
+    if checkpoint is not None:
+        checkpoint.update("unalloc",progress.pages,progress.cells,header,True)
+    logging.info("Unallocated block export complete; %s blocks exported." % str(progress.cells))
+
+def triageFiles(target, outfile, debug):
+    """
+    Triggered if the 't' switch is supplied.
+    Triage a single file or every file beneath a directory using only the DB
+    header and page 1 of each, and write one summary CSV ranked by the
+    estimated slack space (free pages * page size).
+    """
+    print("\n[TRIAGE]")
+    if os.path.isdir(target):
+        filelist = list()
+        for dirpath, dirnames, filenames in os.walk(target):
+            for filename in filenames:
+                filelist.append(os.path.join(dirpath, filename))
+    else:
+        filelist = [target]
+
+    print(" <TRIAGING %s FILE(S)>\n" % str(len(filelist)))
+    triagelist = list()
+    sqlitecount = 0
+    errorcount = 0
+    for filepath in filelist:
+        # Files which cannot be triaged are still listed, with an error status.
+        try:
+            header = NotionalSQLite.NotionalSQLite(filepath,debug)
+        except:
+            logging.error("ERROR: Could not triage file: %s" % filepath)
+            triagelist.append([filepath,"Error - could not be triaged","","","","",0,"",""])
+            errorcount += 1
+            continue
+        if header.statuscode != 0:
+            if header.dbfile is None:
+                status = "Error - could not be opened"
+            elif header.statuscode == 2:
+                status = "Error - invalid page size"
+            else:
+                status = "Error - too small for a database header"
+            logging.error("ERROR: Could not triage file: %s" % filepath)
+            triagelist.append([filepath,status,"","","","",0,"",""])
+            errorcount += 1
+            header.close()
+            continue
+        try:
+            result = header.triage()
+        except:
+            logging.error("ERROR: Could not parse page 1 of file: %s" % filepath)
+            triagelist.append([filepath,"Error - page 1 could not be parsed","","","","",0,"",""])
+            errorcount += 1
+            header.close()
+            continue
+        header.close()
+        if not result['sigvalid']:
+            triagelist.append([filepath,"Invalid","","","","",0,"",""])
+            continue
+        sqlitecount += 1
+        triagelist.append([filepath,
+                           "Valid",
+                           result['pagesize'],
+                           result['textencode'],
+                           "WAL" if result['wal'] else "Legacy",
+                           result['totalfreepage'],
+                           result['slack'],
+                           len(result['tables']) if result['schemacomplete'] else "Page 1 is interior",
+                           ";".join(result['tables'])])
+
+    triagelist.sort(key=lambda row: row[6], reverse=True)
+    outtriagecsv = openCSV(outfile+"_triage.csv")
+    triagecsv = csv.writer(outtriagecsv)
+    triagecsv.writerow(["File","Signature","Page Size","Text Encoding","Journal Mode","Free Pages","Estimated Slack (bytes)","Table Count","Tables"])
+    for row in triagelist:
+        triagecsv.writerow(row)
+    outtriagecsv.close()
+    logging.info("Triage complete; %s of %s file(s) have a valid SQLite signature, %s could not be triaged." % (str(sqlitecount),str(len(filelist)),str(errorcount)))
+
+def carveImage(infile, outcsv, pagesize, debug, outactivecsv, outunalloctsv, index=None, hardened=False, timeout=None, outfile=None, progressfile=None, orphanencoding="utf-8", content=False):
+    """
+    Triggered if the 'k' switch is supplied.
+    Carve embedded databases and orphaned table leaf pages from a raw image.
+    Each carved database is treated as a virtual database and, along with the
+    orphaned pages, passed through the active/unallocated exports if requested.
+    If content is set, each carved database also gets a content report (see
+    contentanalysis) after the list of carved databases.
+    Orphaned pages are decoded headerless, with TEXT in the given encoding.
+    All offsets reported are absolute offsets within the image.
+    """
+    print("\n[CARVING]")
+    print(" <SCANNING IMAGE FOR DATABASE HEADERS AND %s BYTE LEAF PAGES>\n" % str(pagesize))
+    carvedlist, orphanlist = NotionalSQLite.carveImage(infile, pagesize, timeout=timeout)
+    logging.info("Carving complete; %s database(s) and %s orphaned leaf table page(s) found." % (str(len(carvedlist)),str(len(orphanlist))))
+
+    outcsv.writerow(["{CARVED DATABASES}"])
+    outcsv.writerow(["#","Header Offset","End Offset","Page Size","Leaf Table Pages"])
+    for carved in carvedlist:
+        header = NotionalSQLite.NotionalSQLite(infile,debug,carved['offset'],carved['dbend'],hardened)
+        if header.statuscode != 0:
+            continue
+        outcsv.writerow([carvedlist.index(carved)+1,carved['offset'],carved['dbend'],header.getPageSize(),len(header.pagetypedict['leaftable'])])
+        if outactivecsv is not None:
+            dumpActiveRows(header,outactivecsv,header.pagetypedict,header.getPageSize(),index=index,progressfile=progressfile)
+        if outunalloctsv is not None:
+            dumpUnallocated(header,outunalloctsv,header.pagetypedict,header.getPageSize(),index=index,progressfile=progressfile)
+        if hardened:
+            writePageErrors(header,outfile)
+        header.close()
+
+    if content: # if 'c' switch is used.
+        for carved in carvedlist:
+            header = NotionalSQLite.NotionalSQLite(infile,debug,carved['offset'],carved['dbend'],hardened)
+            if header.statuscode != 0:
+                continue
+            outcsv.writerow(["{CARVED DATABASE: %s}" % str(carvedlist.index(carved)+1)])
+            try:
+                header.schema
+            except NotionalSQLite.PageParseError as e:
+                logging.error('ERROR: Could not parse the master table of carved database %s - no content report.\nError: %s' % (str(carvedlist.index(carved)+1),e))
+                header.close()
+                continue
+            contentanalysis(header, None, outcsv)
+            if hardened:
+                writePageErrors(header,outfile)
+            header.close()
+
+    outcsv.writerow(["{ORPHANED LEAF TABLE PAGES}"])
+    outcsv.writerow(["Page Size","Leaf Table Pages"])
+    outcsv.writerow([pagesize,len(orphanlist)])
+    if len(orphanlist) > 0:
+        # Orphaned pages have no header of their own - nothing is taken from
+        # the bytes at the start of the image.
+        textencode = {"utf-8":1,"utf-16le":2,"utf-16be":3}[orphanencoding]
+        header = NotionalSQLite.NotionalSQLite(infile,debug,hardened=hardened,headerless=True,textencode=textencode)
+        orphandict = dict({'leaftable':orphanlist})
+        if outactivecsv is not None:
+            dumpActiveRows(header,outactivecsv,orphandict,pagesize,False,index,progressfile)
+        if outunalloctsv is not None:
+            dumpUnallocated(header,outunalloctsv,orphandict,pagesize,index,progressfile)
+        if hardened:
+            writePageErrors(header,outfile)
+        header.close()
+
+def diffSnapshots(header,difffile,outfile,debug,timeout=None):
+    """
+    Triggered if the 'd' switch is supplied.
+    Compare the target database against a later snapshot of it page by page,
+    then decode only the changed pages to report the rows added, removed or
+    modified (by table and rowid) and the freeblocks that appeared.
+    """
+    print("\n[SNAPSHOT DIFF]")
+    later = NotionalSQLite.NotionalSQLite(difffile,debug,hardened=header.hardened)
+    if later.statuscode != 0 or not later.checkSignature():
+        logging.error("ERROR: Snapshot is not a valid SQLite database - skipping diff: %s" % difffile)
+        return
+    if later.getPageSize() != header.getPageSize():
+        logging.error("ERROR: Snapshot page size differs from the target database - skipping diff.")
+        later.close()
+        return
+
+    print(" <COMPARING PAGES>\n")
+    changedpages = NotionalSQLite.diffPages(header.dbfile.name,difffile,header.getPageSize(),timeout=timeout)
+    logging.info("Page comparison complete; %s page(s) changed." % str(len(changedpages)))
+
+    print(" <DECODING CHANGED PAGES>\n")
+    outdiff = openCSV(outfile+"_diff.csv")
+    outdiffcsv = csv.writer(outdiff)
+    outdiffcsv.writerow(["{CHANGED PAGES}"])
+    outdiffcsv.writerow(["Page Offset"])
+    for page in changedpages:
+        outdiffcsv.writerow([page])
+
+    rowdifflist = header.diffRows(later,changedpages)
+    outdiffcsv.writerow(["{CHANGED ROWS}"])
+    outdiffcsv.writerow(["Change","Table","Rowid","Page Offset","Values"])
+    for row in rowdifflist:
+        outdiffcsv.writerow(csvRow([row[0],row[1] if row[1] is not None else "<UNKNOWN>",row[2],row[3]] + row[4]))
+
+    freeblklist = header.diffFreeblocks(later,changedpages)
+    outdiffcsv.writerow(["{NEW FREEBLOCKS}"])
+    outdiffcsv.writerow(["Offset","Unallocated Type","Block Length","Printable Data"])
+    for row in freeblklist:
+        outdiffcsv.writerow(csvRow(row))
+    outdiff.close()
+    if later.hardened:
+        writePageErrors(later,outfile)
+    later.close()
+    logging.info("Snapshot diff complete; %s row change(s) and %s new freeblock(s)." % (str(len(rowdifflist)),str(len(freeblklist))))
+
+def searchIndex(outfile, keyword, regex):
+    """
+    Triggered if the 'q' or 'r' switch is supplied.
+    Answer a keyword or regular expression query from the search index built
+    by an earlier run with the 's' switch, and write the hits to a CSV.
+    """
+    print("\n[SEARCH]")
+    indexpath = outfile+"_index.db"
+    if not os.path.isfile(indexpath):
+        logging.error("ERROR: No search index found at %s - run with -s and -a/-u first." % os.path.abspath(indexpath))
+        return
+    index = NotionalIndex.NotionalIndex(indexpath)
+    hitlist = list()
+    if keyword:
+        hitlist.extend(index.search(keyword))
+    if regex:
+        hitlist.extend(index.searchRegex(regex))
+    index.dbconn.close()
+
+    row_format = "{:<20} {:>14} {:>14} {:<14} {:<}"
+    print(row_format.format("Term","Page Offset","Cell Offset","Region","Table"))
+    print(row_format.format("----","-----------","-----------","------","-----"))
+    outsearch = openCSV(outfile+"_search.csv")
+    outsearchcsv = csv.writer(outsearch)
+    outsearchcsv.writerow(["Term","Page Offset","Cell Offset","Region","Table"])
+    for hit in hitlist:
+        print(row_format.format(hit[0],hit[1],hit[2],hit[3],hit[4] if hit[4] is not None else ""))
+        outsearchcsv.writerow(hit)
+    outsearch.close()
+    logging.info("Search complete; %s hit(s)." % str(len(hitlist)))
+
+def writePageErrors(header,outfile):
+    """
+    Triggered if the 'z' switch is supplied.
+    Append the pages which failed to parse, as recorded by the header object,
+    to the error report and clear them from the object.
+    """
+    if len(header.pageerrors) == 0:
+        return
+    logging.info("WARNING: %s page(s) or cell(s) could not be parsed and were skipped - see %s" % (str(len(header.pageerrors)),os.path.abspath(outfile+"_errors.csv")))
+    outerrors = openCSV(outfile+"_errors.csv","a")
+    outerrorcsv = csv.writer(outerrors)
+    for error in header.pageerrors:
+        outerrorcsv.writerow(error)
+    outerrors.close()
+    header.pageerrors = list()
 
 def mapPages(header, outcsv):
     """
     Triggered if the 'm' switch is supplied.
     Generate a visual map of the database's page type distribution.
     """
-    print "\n[PAGE MAP]\n"
-    pagemap = header.mapPages(header.headerdict['pagesize'])
+    print("\n[PAGE MAP]\n")
+    pagemap = header.mapPages(header.getPageSize())
     mapheaderfields = (("Page Map"),
                        ("Interior Index Pages (i)"),
                        ("Interior Table Pages (t)"),
@@ -331,16 +966,16 @@ def mapPages(header, outcsv):
         if (i == 0):
             j=0
             rowlabel = "{:>%s}" % len(str(len(pagemap[0]))+"  ")
-            print rowlabel.format("  ") + "0       8      16      24      31"
-            print rowlabel.format("  ") + "|.......|.......|.......|......."
+            print(rowlabel.format("  ") + "0       8      16      24      31")
+            print(rowlabel.format("  ") + "|.......|.......|.......|.......")
             while True:
-                print rowlabel.format(str(j) + ": ") + pagemap[0][j:j+32]
+                print(rowlabel.format(str(j) + ": ") + pagemap[0][j:j+32])
                 j+=32
                 if (j>len(pagemap[0])):
-                    print ""
+                    print("")
                     break
         else:
-            print " %s: %s" % (value,pagemap[i])
+            print(" %s: %s" % (value,pagemap[i]))
         outcsv.writerow((value,pagemap[i]))
         i+=1
 
@@ -355,15 +990,16 @@ def setupLogging(outfile):
     console.setLevel(logging.INFO)
     console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(console)
-    logging.info("""\n   _____ ____    __    _ __    _____
+    logging.info(r"""
+   _____ ____    __    _ __    _____
   / ___// __ \  / /   (_) /___/__  / Notional Labs 2013
   \__ \/ / / / / /   / / __/ _ \/ / / _ \/ ___/
  ___/ / /_/ / / /___/ / /_/  __/ /_/  __/ /
 /____/\___\_\/_____/_/\__/\___/____|___/_/
 Forensic SQLite Database Analyser and Reporting Tool         """)
-    print "-------------------------------------------------------"
+    print("-------------------------------------------------------")
     logging.info(" Version ["+version+"] Build ["+build+"] Author [James E. Hung]")
-    print "-------------------------------------------------------"
+    print("-------------------------------------------------------")
     return
 
 def validateArgs():
@@ -377,17 +1013,36 @@ def validateArgs():
     parser.add_argument('-c','--content', help='OPTIONAL: Generate content report.', action='store_true')
     parser.add_argument('-m','--pagemap', help='OPTIONAL: Print a visual map of the physical page distribution', action='store_true')
     parser.add_argument('-u','--unalloc', help='OPTIONAL: Dump all unallocated areas of each page into a CSV.', action='store_true')
+    parser.add_argument('-t','--triage', help='OPTIONAL: Fast header-only triage of the input file, or of every file beneath the input directory, into a single CSV (no other reports are generated).', action='store_true')
+    parser.add_argument('-k','--carve', help='OPTIONAL: Treat the input as a raw disk image and carve embedded databases and orphaned leaf table pages from it (combine with -a/-u to export their content).', action='store_true')
+    parser.add_argument('-p','--pagesize', help='OPTIONAL: Page size used to locate orphaned leaf table pages when carving (default 4096).', type=int, default=4096)
+    parser.add_argument('-n','--encoding', help='OPTIONAL: Text encoding of orphaned leaf table pages found when carving (default utf-8).', choices=['utf-8','utf-16le','utf-16be'], default='utf-8')
+    parser.add_argument('-d','--diff', help='OPTIONAL: Later snapshot of the target database to diff against (changed rows and new freeblocks).')
+    parser.add_argument('-s','--index', help='OPTIONAL: Build a keyword search index from the -a/-u exports.', action='store_true')
+    parser.add_argument('-q','--query', help='OPTIONAL: Look up a keyword in the search index of an earlier -s run with the same output name.')
+    parser.add_argument('-r','--regex', help='OPTIONAL: Match a regular expression against the terms in the search index of an earlier -s run with the same output name.')
+    parser.add_argument('-z','--hardened', help='OPTIONAL: Record pages and cells that fail bounds/cycle checks in an error report and carry on, instead of stopping.', action='store_true')
+    parser.add_argument('-w','--timeout', help='OPTIONAL: Seconds to wait for each parallel carving/diff worker before abandoning its region.', type=float)
+    parser.add_argument('-l','--progress', help='OPTIONAL: Append machine-readable (JSON lines) progress samples for the -a/-u exports to this file.')
+    parser.add_argument('-e','--resume', help='OPTIONAL: Resume an interrupted -a/-u export from its checkpoint, appending to the existing outputs.', action='store_true')
     parser.add_argument('-x','--debug', help='OPTIONAL: Developers Only - Enable debug mode.', action='store_true')
 
     args = vars(parser.parse_args())
 
+    if (args['pagesize'] < 512) or (args['pagesize'] > 65536) or (args['pagesize'] & (args['pagesize']-1)):
+        print("Page size must be a power of two between 512 and 65536. Exiting...")
+        sys.exit(1)
+
+    if args['triage'] and os.path.isdir(args['input']):
+        return args['output'],args['input'],args['pagemap'],args['debug'],args['active'],args['content'],args['unalloc'],args['triage'],args['carve'],args['pagesize'],args['diff'],args['index'],args['query'],args['regex'],args['hardened'],args['timeout'],args['progress'],args['resume'],args['encoding']
+
     try:
         with open(args['input']): pass
     except IOError:
-        print "Target SQLite DB file does not exist or cannot be opened. Exiting..."
+        print("Target SQLite DB file does not exist or cannot be opened. Exiting...")
         sys.exit(1)
 
-    return args['output'],args['input'],args['pagemap'],args['debug'],args['active'],args['content'],args['unalloc']
+    return args['output'],args['input'],args['pagemap'],args['debug'],args['active'],args['content'],args['unalloc'],args['triage'],args['carve'],args['pagesize'],args['diff'],args['index'],args['query'],args['regex'],args['hardened'],args['timeout'],args['progress'],args['resume'],args['encoding']
 
 if __name__ == '__main__':
     main()